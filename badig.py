@@ -23,51 +23,46 @@ badig.py -h for help.
 # Standard libraries
 import re
 import sys
+import json
 import time
+import string
 import os.path
+import shlex
+import pickle
+import hashlib
+import threading
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
 from collections import namedtuple, defaultdict
 
 # Custom modules
 from support.helper import IO
+from support.helper import Cache
+from support.helper import Stats
 from support.helper import Infolog
 from support.badig_settings import Settings
-
-# if coming from a module
-# pass the file name as argument to the init() method
-# Badig is not being called by a module anymore
-# But it is left here in case it's needed
-external = None
-if __name__ != '__main__':
-    external = [os.path.basename(sys.argv[1])]
-
-# Initialize settings
-stg = Settings()
-stg.init(external)
-
-# Classic modules
-Classic = stg.Classic
-Tools = stg.Tools
-
-# Dignified module
-Dignified = stg.Dignified
-
-# Initlalize Infolog
-infolog = Infolog()
-
-# Apply verbose
-infolog.level = stg.verbose_level
-
+from support import badig_dignified as Dignified
+from support import badig_automaton
+from support import badig_variables
+from support.badig_variables import VariableConflicts
+from support.badig_automaton import Automaton
 
 # Convert information to the logger module format -----------------------------
 class Info():
     '''Convert the information to the infolog module and send it
-       lvl = Message level
-       desc = Message description
-       tok = Current token being addressed
-       bullet = Bullet format override
-       show_file = Show filename on the message'''
+       infolog = Infolog object with the verbose level of the conversion'''
+
+    def __init__(self, infolog):
+        self.infolog = infolog
+
+    def log(self, lvl, desc, tok=None, bullet=None, show_file=False):
+        '''Send a message
+           lvl = Message level
+           desc = Message description
+           tok = Current token being addressed
+           bullet = Bullet format override
+           show_file = Show filename on the message'''
 
-    def log(lvl, desc, tok=None, bullet=None, show_file=False):
         if tok:
             data_pack = namedtuple('data_pack', 'lin col offset text file')
             tok = data_pack(tok.pos.lin,
@@ -76,15 +71,22 @@ class Info():
                             tok.pos.text,
                             tok.pos.file)
 
-        infolog.log(lvl, desc, tok, bullet, show_file)
+        self.infolog.log(lvl, desc, tok, bullet, show_file)
 
 
 # Language descriptions -------------------------------------------------------
-class Description(Dignified.Description, Classic.Description):
+class Description:
     '''Describes the classic and dignified versions of Basic
-    Mix Dignified and Classic modules and adds global descriptions'''
+    Mixed with the Dignified and Classic modules by shared() and adds global descriptions
+    Built once per system and frozen after construction
+    The mutable per file state lives on the Scope object
+       stg = Settings object'''
 
-    def __init__(self):
+    # Descriptions already built by classic module
+    _shared = {}
+    _lock = threading.Lock()
+
+    def __init__(self, stg):
         super(Description, self).__init__()
 
         # General
@@ -123,13 +125,96 @@ class Description(Dignified.Description, Classic.Description):
                             fr'{main_new}|'
                             fr'{main_spc}')
 
-        # Compiling all groups (Order is important)
-        self.commands = re.compile(''
-                                   fr'{self.main_groups}|'
-                                   fr'{self.dignified_groups}|'
-                                   fr'{self.classic_groups}|'
-                                   fr'{self.d_idnttp}',
-                                   re.I)
+        # All groups (Order is important)
+        self.commands_pattern = (''
+                                 fr'{self.main_groups}|'
+                                 fr'{self.dignified_groups}|'
+                                 fr'{self.classic_groups}|'
+                                 fr'{self.d_idnttp}')
+
+        # Identifier with type compiled for the tokens
+        self.c_idnttp_re = re.compile(self.c_idnttp_grp)
+
+        # Compiled tables: the automaton recognizing the same groups as the commands
+        # and the unicode translation. Kept on disk until a description changes
+        cache = Cache(os.path.join(stg.LOCAL_PATH, 'cache', f'{stg.Classic.__name__}.tables'),
+                      [Dignified.__file__, stg.Classic.__file__, badig_automaton.__file__],
+                      self.commands_pattern)
+        tables = cache.load()
+        if tables is None:
+            tables = self.compile_tables()
+            cache.save(tables)
+
+        self.automaton = tables['automaton']
+        self.c_translation = tables['translation']
+
+        # Sets of the code generation and the characters translate cannot encode
+        self.c_reserved_set = frozenset(self.c_reserved_kw)
+        self.c_symb_set = frozenset(self.c_symb_comp)
+        self.c_untranslatable_re = re.compile('[^\x00-\u0100]')
+
+        self.freeze()
+
+        # Tokens of the standalone strings, the only thing filled after freezing
+        object.__setattr__(self, 'templates', {})
+
+    @property
+    def commands(self):
+        '''Compiled regex with all groups'''
+
+        return re.compile(self.commands_pattern, re.I)
+
+    @property
+    def legacy_commands(self):
+        '''Compiled regex with all groups and the partial matches of the legacy lexer'''
+
+        partials = self.join_commands(self.d_partls, self.c_partls)
+        return re.compile(fr'{self.commands_pattern}|(?P<partial>{partials})', re.I)
+
+    def compile_tables(self):
+        '''Build the tables derived from the descriptions'''
+
+        automaton = Automaton(self.commands_pattern, re.I)
+        automaton.fill(string.printable)
+
+        translation = str.maketrans(self.c_original, self.c_translat)
+        translation.update(str.maketrans(getattr(self, 'c_replacements', {})))
+
+        return {'automaton': automaton, 'translation': translation}
+
+    @classmethod
+    def shared(cls, stg):
+        '''Give the language description of the system on the settings
+        It is built on the first call and reused afterwards
+           stg = Settings object with the classic module'''
+
+        with cls._lock:
+            des = cls._shared.get(stg.Classic.__name__)
+            if des is None:
+                system = type('Description', (cls, Dignified.Description, stg.Classic.Description), {})
+                des = system(stg)
+                cls._shared[stg.Classic.__name__] = des
+
+        return des
+
+    def freeze(self):
+        '''Turn the containers read only and lock the attributes'''
+
+        for name, value in vars(self).items():
+            if isinstance(value, list):
+                value = tuple(value)
+            elif isinstance(value, set):
+                value = frozenset(value)
+            elif isinstance(value, dict):
+                value = MappingProxyType(value)
+            object.__setattr__(self, name, value)
+
+        object.__setattr__(self, '_frozen', True)
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'Language description is read only: {name}')
+        super(Description, self).__setattr__(name, value)
 
     def join_commands(self, *args):
         '''Join list items with individual regex terminators'''
@@ -138,6 +223,72 @@ class Description(Dignified.Description, Classic.Description):
         l = r'$|^'.join(l)
         return fr'(^{l}$)'
 
+    def scan(self, text, start):
+        '''Find the longest token starting at a position of a text
+        Return the matched group and the end position of the token
+           text = Text to scan
+           start = Position of the first character'''
+
+        return self.automaton.scan(text, start)
+
+    def match_group(self, text):
+        '''Get the group matching a whole text or None'''
+
+        return self.automaton.match(text)
+
+    def template(self, text):
+        '''Get the groups and values of the tokens of a standalone string
+        Scanned on the first call and reused afterwards
+           text = The string to scan'''
+
+        template = self.templates.get(text)
+        if template is None:
+            template = []
+            rest = text
+            while True:
+                match_group, end = self.scan(rest, 0)
+                val = rest[:max(end, 1)].strip(' ')
+                template.append((match_group, val))
+
+                rest = rest[len(val):].strip()
+                if not rest:
+                    break
+
+            template = tuple(template)
+            self.templates[text] = template
+
+        return template
+
+
+# Scope -----------------------------------------------------------------------
+class Scope:
+    '''Hold the state gathered while parsing a file
+    Anything not found here is read from the shared language description
+       des = Shared language description object
+       include_vars = Variables brought from the including file
+                      (short vars, long vars, declares)'''
+
+    def __init__(self, des, include_vars):
+        self.language = des
+
+        # Defines dictionary
+        self.d_defines = {}
+        # Declares dictionary
+        self.d_declares = dict(include_vars[2])
+        # Functions dictionary
+        self.d_functions = {}
+        # Toggle rems list
+        self.d_keeps = []
+        # Hard coded short variable names
+        self.c_hard_short_vars = set(include_vars[0])
+        # Kept long named variables
+        self.c_hard_long_vars = set(include_vars[1])
+        # Hard and declared variables indexed to find the conflicts
+        self.conflicts = VariableConflicts(self)
+
+    def __getattr__(self, name):
+        return getattr(self.language, name)
+
 
 # Token -----------------------------------------------------------------------
 class Token:
@@ -146,16 +297,26 @@ class Token:
        val = Token value
        pos = Position object'''
 
+    __slots__ = ('tok', 'val', 'pos')
+
+    # Each conversion uses a subclass made by Context
+    # with its language description and amount of tokens created
+    des = None
+    created = 0
+
+    # Uppercase token types by the name they are created with, shared by all tokens
+    types = {}
+
     def __init__(self, tok='', val=None, pos=None):
+        type(self).created += 1
+
+        if tok:
+            tok = Token.types.get(tok) or Token.types.setdefault(tok, sys.intern(tok.upper()))
+
         self.tok = tok
         self.val = val
         self.pos = pos
 
-        self.c_idnttp_grp = Description().c_idnttp_grp
-
-        if self.tok:
-            self.tok = self.tok.upper()
-
     @property
     def uval(self):
         '''Create an uppercase value'''
@@ -169,7 +330,7 @@ class Token:
     @property
     def var_name(self):
         '''Give variable identifier'''
-        g = re.match(self.c_idnttp_grp, self.val)
+        g = self.des.c_idnttp_re.match(self.val)
         var_name = g.group(1)
         return str(var_name).lower()
 
@@ -183,13 +344,17 @@ class Token:
     @property
     def var_type(self):
         '''Give variable type'''
-        g = re.match(self.c_idnttp_grp, self.val)
+        g = self.des.c_idnttp_re.match(self.val)
         var_type = g.group(2)
         return str(var_type).lower()
 
     def copy(self):
         '''Make a copy of the object'''
-        return Token(self.tok, val=self.val, pos=self.pos.copy())
+        return type(self)(self.tok, val=self.val, pos=self.pos.copy())
+
+    def __reduce__(self):
+        '''Pickle as a plain token, the conversion using it gives back its own class'''
+        return Token, (self.tok, self.val, self.pos)
 
     def __repr__(self):
         '''Nicer way of representing the object information'''
@@ -206,21 +371,37 @@ class Token:
 # Position --------------------------------------------------------------------
 class Position:
     '''Define and create the positional information object for the token
+    The text, file and length are read from the code listing when asked
        d_code = The code listing
        lin = Line position
        col = Column position
        offset = Amount to compensate for leading spaces
                 when displaying the position glyph on error messages'''
 
+    __slots__ = ('d_code', 'lin', 'col', 'offset')
+
     def __init__(self, d_code, lin=0, col=0, offset=0):
         self.lin = lin
         self.col = col + 1  # Columns start with 1, not 0
         self.d_code = d_code
         self.offset = offset
 
-        self.text = d_code[self.lin].text
-        self.file = d_code[self.lin].file
-        self.code_len = len(d_code)
+    @property
+    def text(self):
+        return self.d_code[self.lin].text
+
+    @property
+    def file(self):
+        return self.d_code[self.lin].file
+
+    @property
+    def lead(self):
+        '''Leading spaces of the line'''
+        return self.d_code[self.lin].lead
+
+    @property
+    def code_len(self):
+        return len(self.d_code)
 
     def __repr__(self):
         '''Nicer way for representing the object information'''
@@ -236,20 +417,426 @@ class Position:
 
         lin = self.lin if lin is None else lin
         col = self.col if col is None else col
-        lead_spc = (len(self.text) - len(self.text.lstrip()))
-        offset = lead_spc if offset is None else offset
+        offset = self.lead if offset is None else offset
         d_code = self.d_code if d_code is None else d_code
 
         return Position(d_code=d_code, lin=lin, col=col, offset=offset)
 
 
+class Cursor(Position):
+    '''Position of the lexer on the code, with the text of the line being read
+       d_code = The code listing
+       lin = Line position
+       col = Column position'''
+
+    __slots__ = ('text', 'lead')
+
+    def __init__(self, d_code, lin=0, col=0):
+        super(Cursor, self).__init__(d_code, lin=lin, col=col)
+        self.set_text(d_code[lin].text)
+
+    def set_text(self, text):
+        '''Change the text being read'''
+
+        self.text = text
+        self.lead = len(text) - len(text.lstrip())
+
+
+# Define ----------------------------------------------------------------------
+class Define:
+    '''Define compiled to be expanded where it is used
+    The tokens of the replacement are kept as their values and the values of their positions,
+    with the variable slots marked, so each use only creates the tokens it gives
+       repl = Replacement tokens, D_DEFVAR where the variable goes
+       varv = Default variable tokens or None'''
+
+    def __init__(self, repl, varv):
+        self.repl = repl
+        self.varv = varv
+
+        # (tok, val, d_code, offset) of each token, None on the variable slots
+        self.parts = []
+        for d in repl:
+            if d.tok == 'D_DEFVAR':
+                self.parts.append(None)
+            else:
+                self.parts.append((d.tok, d.val, d.pos.d_code, d.pos.lead))
+
+        self.slots = self.parts.count(None)
+        self.size = len(self.parts) - self.slots
+
+    def expand(self, Tok, pos, variable):
+        '''Give the tokens of the define used at a position
+        Each token has its own position, the parser changes some of them in place
+           Tok = Token class of the conversion
+           pos = Position of the define use
+           variable = Variable tokens'''
+
+        variable = [(v.tok, v.val, v.pos) for v in variable] if self.slots else []
+
+        for part in self.parts:
+            if part is None:
+                for tok, val, var_pos in variable:
+                    yield Tok(tok, val, var_pos.copy())
+
+                continue
+
+            tok, val, d_code, offset = part
+            yield Tok(tok, val, Position(d_code, lin=pos.lin, col=pos.col, offset=offset))
+
+
+# Token stream ----------------------------------------------------------------
+class TokenStream:
+    '''Give the tokens of an iterator to the parser as a list read on demand
+    Only the tokens from the start of the line before the previous one are kept
+    the parser does not look further back than that
+       tokens = Token iterator'''
+
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.window = []
+        self.first = 0
+        self.newlines = []
+
+    def __getitem__(self, index):
+        if index < self.first:
+            raise IndexError(f'Token no longer in the stream window: {index}')
+
+        while index >= self.first + len(self.window):
+            try:
+                tk = next(self.tokens)
+            except StopIteration:
+                raise IndexError(f'Token past the end of the stream: {index}')
+
+            if tk.tok == 'NEWLINE':
+                self.newlines.append(self.first + len(self.window))
+                if len(self.newlines) > 3:
+                    start = self.newlines.pop(0)
+                    del self.window[:start - self.first]
+                    self.first = start
+
+            self.window.append(tk)
+
+        return self.window[index - self.first]
+
+    def __len__(self):
+        '''Amount of tokens read so far'''
+
+        return self.first + len(self.window)
+
+    @staticmethod
+    def drain(tokens):
+        '''Give the items of a list removing them as they go
+           tokens = The list to be emptied'''
+
+        tokens.reverse()
+        while tokens:
+            yield tokens.pop()
+
+
+# Include cache ---------------------------------------------------------------
+class IncludeCache:
+    '''Keep the included files already processed to use them again
+    An include is kept with the tokens it gives after the third pass,
+    the variables it adds and the messages it shows,
+    keyed by its content, the settings and the variables it receives.
+    Kept in memory for the next includes and, if asked, on disk for the next conversions
+       ctx = Context object of the conversion'''
+
+    # Processed includes of all conversions, the oldest are dropped
+    memory = {}
+    memory_size = 64
+    lock = threading.Lock()
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.stg = ctx.stg
+        self.folder = os.path.join(self.stg.LOCAL_PATH, 'cache', 'includes')
+        self.settings = None
+
+        # Files read and includes made by the includes being processed
+        self.reading = []
+
+    def key(self, include_file, include_vars):
+        '''Make the key of an include or None if the file can't be read'''
+
+        file_hash = Cache.digest(include_file)
+        if file_hash is None:
+            return None
+
+        # Settings and modules, the same for all the includes of a conversion
+        if self.settings is None:
+            args = {k: v for k, v in vars(self.stg.args).items()
+                    if k not in ('input', 'output', 'icd')}
+            modules = [Dignified.__file__, self.stg.Classic.__file__,
+                       badig_automaton.__file__, badig_variables.__file__, __file__]
+            self.settings = repr((sorted(args.items()),
+                                  sorted(vars(self.stg.c_stg).items()),
+                                  self.stg.file_path,
+                                  [Cache.digest(module) for module in modules]))
+
+        short_vars, long_vars, declares = include_vars
+        received = repr((sorted(short_vars),
+                         sorted((var.lval, var.pos.file) for var in long_vars),
+                         list(declares.items())))
+
+        key = hashlib.sha256()
+        for text in (include_file, file_hash, self.settings, received):
+            key.update(text.encode('utf-8'))
+
+        return key.hexdigest()
+
+    def load(self, key):
+        '''Get a kept include from memory or disk or None
+        The files it included must not have changed'''
+
+        with IncludeCache.lock:
+            data = IncludeCache.memory.get(key)
+        if data is None and self.stg.include_disk:
+            data = Cache(os.path.join(self.folder, f'{key}.include'), [], key).load()
+        if data is None:
+            return None
+
+        try:
+            include = pickle.loads(data)
+        except (EOFError, ValueError, TypeError, AttributeError,
+                ImportError, pickle.UnpicklingError):
+            return None
+
+        for file_load, file_hash in include['files'].items():
+            if Cache.digest(file_load) != file_hash:
+                return None
+
+        self.remember(key, data)
+
+        return include
+
+    def save(self, key, include):
+        '''Keep a processed include in memory and on disk if asked
+        Failing to pickle only means it will be processed again'''
+
+        try:
+            data = pickle.dumps(include, pickle.HIGHEST_PROTOCOL)
+        except (TypeError, AttributeError, pickle.PicklingError):
+            return
+
+        self.remember(key, data)
+        if self.stg.include_disk:
+            Cache(os.path.join(self.folder, f'{key}.include'), [], key).save(data)
+
+    def remember(self, key, data):
+        '''Keep a pickled include in memory as the newest'''
+
+        with IncludeCache.lock:
+            IncludeCache.memory.pop(key, None)
+            IncludeCache.memory[key] = data
+            while len(IncludeCache.memory) > IncludeCache.memory_size:
+                del IncludeCache.memory[next(iter(IncludeCache.memory))]
+
+    def count(self, include):
+        '''Pass the files and includes of an include to the one including it'''
+
+        if self.reading:
+            self.reading[-1]['files'].update(include['files'])
+            self.reading[-1]['includes'] += include['includes']
+
+    def process(self, include_file, include_vars, process_include):
+        '''Give the tokens and the variables of an include, kept or processed
+           include_file = Name of the file
+           include_vars = Variables brought from the including file
+           process_include = Function processing the include if it is not kept'''
+
+        if not self.stg.include_cache:
+            return process_include(include_file, include_vars)
+
+        key = self.key(include_file, include_vars)
+        if key is None:
+            return process_include(include_file, include_vars)
+
+        # Kept include: show its messages and add its variables
+        include = self.load(key)
+        if include is not None:
+            Infolog.emit(include['messages'])
+            self.ctx.build.read(*include['files'])
+            for _ in range(include['includes']):
+                self.stg.stats.include()
+
+            for tk in include['tokens'] + include['long_vars']:
+                tk.__class__ = self.ctx.Token
+            self.ctx.Token.created += len(include['tokens'])
+
+            short_vars, long_vars, declares = include_vars
+            include_vars = (set(short_vars) | set(include['short_vars']),
+                            set(long_vars) | set(include['long_vars']),
+                            {**declares, **dict(include['declares'])})
+            self.count(include)
+
+            return include['tokens'], include_vars
+
+        # New include: collect its messages while processing it
+        short_vars, long_vars, declares = include_vars
+        include = {'files': {include_file: Cache.digest(include_file)}, 'includes': 1}
+        self.reading.append(include)
+        outer = getattr(Infolog.capture, 'output', None)
+        messages = []
+        Infolog.capture.output = messages
+        try:
+            parsed, new_vars = process_include(include_file, include_vars)
+        finally:
+            Infolog.capture.output = outer
+            Infolog.emit(messages)
+            self.reading.pop()
+
+        include['messages'] = messages
+        include['tokens'] = parsed
+        include['short_vars'] = sorted(new_vars[0] - set(short_vars))
+        include['long_vars'] = [var for var in new_vars[1] if var not in long_vars]
+        include['declares'] = list(new_vars[2].items())[len(declares):]
+        self.save(key, include)
+        self.count(include)
+
+        return parsed, new_vars
+
+
+# Include prefetch ------------------------------------------------------------
+class IncludePrefetch:
+    '''Read and lex the included files in the background while the main file is processed
+    The includes are found on the lexed tokens, also on the included files,
+    and the parser takes the tokens when it meets them.
+    Anything failing is left for the parser to do again and report
+       ctx = Context object of the conversion'''
+
+    workers = 8
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.stg = ctx.stg
+        self.pool = None
+        self.fetching = {}
+        self.lock = threading.Lock()
+
+    def scan(self, tokens):
+        '''Start reading the files included on the tokens of a file
+        The lines removed by toggle rems are left out as the parser does
+           tokens = Lexed tokens of the file'''
+
+        des = self.ctx.des
+        keeps = []
+        toggle = None
+        block = False
+
+        for idx in range(1, len(tokens) - 1):
+            tk = tokens[idx]
+            next_tk = tokens[idx + 1]
+            line_start = tokens[idx - 1].tok == 'NEWLINE'
+
+            # Skip a toggled line up to its end or a block up to its closing toggle
+            if toggle is not None:
+                if not block and tk.tok == 'NEWLINE':
+                    toggle = None
+                elif block and tk.tok == 'D_TGLREM' and tk.val == toggle.val \
+                        and line_start and next_tk.tok == 'NEWLINE':
+                    toggle = None
+                continue
+
+            if tk.tok == 'D_TGLREM' and line_start:
+                if (tk.uval not in keeps and des.d_keep_all not in keeps) \
+                        or des.d_keep_none in keeps:
+                    toggle = tk
+                    block = next_tk.tok == 'NEWLINE'
+
+            elif tk.tok == 'D_INSTRC' and tk.uval == 'KEEP':
+                for keep in tokens[idx + 1:]:
+                    if keep.tok != 'D_TGLREM':
+                        break
+                    keeps.append(keep.uval)
+
+            elif tk.tok == 'D_INSTRC' and tk.uval == 'INCLUDE' \
+                    and next_tk.tok == 'C_LITQUO':
+                include = next_tk.val.strip(des.c_quotes).strip()
+                if include:
+                    self.fetch(include)
+
+    def fetch(self, include):
+        '''Read and lex a file on the pool if not done yet
+           include = Name of the file on the include'''
+
+        include_file = include
+        if not os.path.isabs(include_file):
+            include_file = os.path.join(self.stg.file_path, include_file)
+
+        with self.lock:
+            if include_file in self.fetching:
+                return
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(self.workers, 'include')
+            self.fetching[include_file] = self.pool.submit(self.read, include_file)
+
+    def read(self, include_file):
+        '''Load and lex an included file keeping the messages
+        The tokens are counted apart, the threads can't share the count of the conversion
+        Return the tokens, the messages and the tokens created or None if it failed'''
+
+        Token = type('Token', (self.ctx.Token,), {'created': 0, '__slots__': ()})
+
+        messages = []
+        Infolog.capture.output = messages
+        try:
+            include_code = IO.load_file(None, include_file,
+                                        self.stg.load_format, self.stg.tab_lenght)
+            lexed = Lexer(self.ctx, include_code, Token).lex()
+            self.scan(lexed)
+        except SystemExit:
+            return None
+        finally:
+            Infolog.capture.output = None
+
+        return lexed, messages, Token.created
+
+    def take(self, include_file):
+        '''Get the tokens and messages of an included file or None if it must be read now
+        Each file is given once, the tokens change when parsed'''
+
+        with self.lock:
+            future = self.fetching.get(include_file)
+            if future is not None:
+                self.fetching[include_file] = None
+        if future is None:
+            return None
+
+        read = future.result()
+        if read is None:
+            return None
+
+        # The tokens become the ones of the conversion, now counted on it
+        lexed, messages, created = read
+        for tk in lexed:
+            tk.__class__ = self.ctx.Token
+        self.ctx.Token.created += created
+
+        return lexed, messages
+
+    def close(self):
+        '''Drop the files not taken and let the pool go'''
+
+        with self.lock:
+            for future in self.fetching.values():
+                if future is not None:
+                    future.cancel()
+            if self.pool is not None:
+                self.pool.shutdown(wait=False)
+                self.pool = None
+
+
 # Lexer -----------------------------------------------------------------------
 class Lexer:
     '''Scanner to read the text file and create the tokens
-       stg = Settings object
-       d_code = File to process'''
+    The legacy character by character lexer can be asked to compare the token streams
+       ctx = Context object of the conversion
+       d_code = File to process
+       Token = Token class to create, the one of the conversion if not given'''
 
-    def __init__(self, stg, d_code):
+    def __init__(self, ctx, d_code, Token=None):
         self.d_code = d_code
 
         # This is jerry rigged to repeat the last line
@@ -257,12 +844,18 @@ class Lexer:
         # functions are ignoring the last one when addinf the EOF token
         self.d_code.append(d_code[:-1][0])
 
-        self.stg = stg
-        self.des = Description()
-        self.pos = Position(d_code, lin=0, col=-1)
+        self.stg = ctx.stg
+        self.des = ctx.des
+        self.info = ctx.info
+        self.Token = Token or ctx.Token
+        self.pos = Cursor(d_code, lin=0, col=-1)
+
+        if self.stg.legacy_lexer:
+            self.legacy_commands = self.des.legacy_commands
+            self.get_token = self.get_token_legacy
 
         # Run classic module lexer initialization
-        self.clc = Classic.Lexer(self, self.stg, Token)
+        self.clc = ctx.Classic.Lexer(self, self.stg, self.Token)
         self.clc.initialization()
 
     # General -----------------------------------------------------------------
@@ -287,7 +880,7 @@ class Lexer:
         nl = self.des.newline_str
 
         if self.pos.lin <= self.pos.code_len - 1:
-            self.pos.text = self.d_code[self.pos.lin].text.rstrip() + nl
+            self.pos.set_text(self.d_code[self.pos.lin].text.rstrip() + nl)
             return self.pos.text
         else:
             return None
@@ -298,6 +891,48 @@ class Lexer:
         return self.pos.text[self.pos.col]
 
     def get_token(self):
+        '''Makes a token based on the word or character matched.
+        Scan the current line with the language automaton
+        Newlines are joined with the empty lines following them
+        If end of program reached, return the EOF token'''
+
+        text = self.pos.text
+        start = self.pos.col
+        nls = self.des.newline_str
+        last_pos = self.pos.copy()
+
+        if text[start] == nls:
+            partial = ''
+            while self.lookahead() == nls:
+                if self.advance() is None:
+                    return self.Token(tok='EOF',
+                                 val='EOF',
+                                 pos=last_pos)
+                partial += nls
+
+            return self.Token(tok='NEWLINE',
+                         val=partial,
+                         pos=last_pos)
+
+        match_group, end = self.des.scan(text, start)
+
+        # Character not recognized
+        if end == start:
+            return self.Token(tok=None,
+                         val=text[start],
+                         pos=last_pos)
+
+        # Characters that only start a token
+        if match_group is None:
+            match_group = 'PARTIAL'
+
+        self.pos.col = end
+
+        return self.Token(tok=match_group,
+                     val=text[start:end].strip(' '),
+                     pos=last_pos)
+
+    def get_token_legacy(self):
         '''Makes a token based on the word or character matched.
         Get characters until no match is found
         then uses the last positive match
@@ -309,21 +944,21 @@ class Lexer:
 
         while True:
             next_char = self.lookahead()
-            g = self.des.commands.match(partial + next_char)
+            g = self.legacy_commands.match(partial + next_char)
 
             if not g:
                 if not partial:
                     match_group = None
                     partial = next_char
-                return Token(tok=match_group,
-                             val=partial.strip(' '),
-                             pos=last_pos)
+                return self.Token(tok=match_group,
+                                  val=partial.strip(' '),
+                                  pos=last_pos)
 
             advanced = self.advance()
             if advanced is None:
-                return Token(tok='EOF',
-                             val='EOF',
-                             pos=last_pos)
+                return self.Token(tok='EOF',
+                                  val='EOF',
+                                  pos=last_pos)
             partial += advanced
             match_group = g.lastgroup
 
@@ -358,12 +993,12 @@ class Lexer:
 
                 # if not alone in a line with a comment block indicator
                 if not (not partial[:-val_len].strip() and g):
-                    rem_block.append(Token(tok='C_LIBREM',
+                    rem_block.append(self.Token(tok='C_LIBREM',
                                            val=partial,
                                            pos=last_pos_lit))
 
                 if g:
-                    rem_block.append(Token(tok='C_C_BREM',
+                    rem_block.append(self.Token(tok='C_C_BREM',
                                            val=tk.val,
                                            pos=last_pos_close))
                     break
@@ -403,7 +1038,7 @@ class Lexer:
                     part = part + self.advance()
                 break
 
-        return Token(tok=tok,
+        return self.Token(tok=tok,
                      val=part,
                      pos=l_pos)
 
@@ -411,9 +1046,15 @@ class Lexer:
     def lex(self):
         '''Go through the code, get the tokens, adjust them and outputs a list'''
 
+        return list(self.stream())
+
+    def stream(self):
+        '''Go through the code, get the tokens, adjust them and give them as they are done
+        Only the last token is kept to be looked back'''
+
         # Create the token list header
-        self.tk = Token('NEWLINE', self.des.newline_str, self.pos.copy())
-        self.lexer = [Token('PROGRAM', 'PROGRAM', self.pos.copy()), self.tk]
+        self.tk = self.Token('NEWLINE', self.des.newline_str, self.pos.copy())
+        self.lexer = [self.Token('PROGRAM', 'PROGRAM', self.pos.copy()), self.tk]
         self.last_tok = self.tk
 
         self.advance_line()
@@ -429,12 +1070,12 @@ class Lexer:
             # Errors ----------------------------------------------------------
             # Character not recognized at that location
             if not self.tk.tok:
-                Info.log(1, f'Character not recognized in this context: '
+                self.info.log(1, f'Character not recognized in this context: '
                             f'{self.tk.val}', self.tk)
 
             # Unfinished part of potential matches
-            elif self.tk.tok == 'C_PARTLS' or self.tk.tok == 'D_PARTLS':
-                Info.log(1, f'Token incomplete: {self.tk.val}', self.tk)
+            elif self.tk.tok == 'PARTIAL':
+                self.info.log(1, f'Token incomplete: {self.tk.val}', self.tk)
 
             # Fix toggle rems not at the start of a line
             # convert to correct tokens of # and ident/number
@@ -445,13 +1086,13 @@ class Lexer:
 
                 g = re.match(self.des.d_togremchk, self.tk.val)
 
-                tok = self.des.commands.match(g.group(1))
-                self.lexer.append(Token(tok=tok.lastgroup,
+                tok = self.des.match_group(g.group(1))
+                self.lexer.append(self.Token(tok=tok,
                                         val=g.group(1),
                                         pos=self.pos.copy()))
 
-                tok = self.des.commands.match(g.group(2))
-                self.tk = (Token(tok=tok.lastgroup,
+                tok = self.des.match_group(g.group(2))
+                self.tk = (self.Token(tok=tok,
                                  val=g.group(2),
                                  pos=self.pos.copy()))
 
@@ -462,7 +1103,7 @@ class Lexer:
                 rem_block = self.get_lit_block(self.tk)
 
                 if rem_block is None:
-                    Info.log(1, f'Block not closed from: {self.tk.val}', last_tok)
+                    self.info.log(1, f'Block not closed from: {self.tk.val}', last_tok)
 
                 self.lexer.extend(rem_block)
 
@@ -477,7 +1118,7 @@ class Lexer:
             # Classic line rems (comment block indicator not at the start of a line)
             elif self.tk.tok == 'C_O_BREM' and self.last_tok.tok != 'NEWLINE':
 
-                self.lexer.append(Token(tok='C_LINREM',
+                self.lexer.append(self.Token(tok='C_LINREM',
                                         val=self.des.c_altrem,
                                         pos=self.pos.copy(col=self.pos.col - 2)))
 
@@ -525,29 +1166,148 @@ class Lexer:
             if self.tk.tok == 'EOF':
                 break
 
-        return self.lexer
+            yield from self.lexer[:-1]
+            del self.lexer[:-1]
+
+        yield from self.lexer
+
+
+# Pass manager ----------------------------------------------------------------
+Stage = namedtuple('Stage', 'name label run output needs provides')
+
+
+class Passes:
+    '''Run the parser passes as stages fusing the ones that can share a traversal
+    A stage needing something the stages before it only know at their end
+    waits for their whole output, the others read their tokens as they are done
+       par = Parser object'''
+
+    stages = {stage.name: stage for stage in (
+        # Rem toggles, defines, declares, keeps, function definitions
+        Stage('pass_1', 'Pass 1', 'pass_1', 'tokens', needs=(),
+              provides=('functions', 'declares')),
+        # Function calls, labels
+        Stage('pass_2', 'Pass 2', 'pass_2', 'tokens', needs=('functions',),
+              provides=()),
+        # Includes, rem blocks, newline cleanup, string joins, hard variables
+        Stage('pass_3', 'Pass 3', 'pass_3', 'tokens', needs=(),
+              provides=('hard_vars',)),
+        # Label lines, line numbers, header, variable shortening
+        Stage('pass_4', 'Pass 4', 'pass_4', 'tokens', needs=('declares', 'hard_vars'),
+              provides=('line_numbers',)),
+        # Classic alterations, capitalization
+        Stage('pass_5', 'Pass 5', 'pass_5', 'tokens', needs=('line_numbers',),
+              provides=()),
+        # Classic code lines
+        Stage('generate', 'Generating', 'generate_lines', 'lines',
+              needs=('line_numbers',), provides=()))}
+
+    # The parser attributes each stage keeps for itself
+    cursor = ('tok_list_in', 'tok_list_out', 'index', 'len', 'tk')
+
+    def __init__(self, par):
+        self.par = par
+
+    def groups(self, names):
+        '''Split the stages to run on the ones needing the end of the previous
+           names = Names of the stages in order'''
+
+        groups = []
+        provided = set()
+        for name in names:
+            stage = self.stages[name]
+            if not groups or provided.intersection(stage.needs):
+                groups.append([])
+                provided = set()
+            groups[-1].append(stage)
+            provided.update(stage.provides)
+
+        return groups
+
+    def run(self, names, tokens, stream=False):
+        '''Run the stages giving the output of the last one
+           names = Names of the stages in order
+           tokens = Input of the first stage
+           stream = Give the output of the last fused stages as it is done'''
+
+        groups = self.groups(names)
+        for group in groups:
+            for stage in group:
+                self.par.info.log(5, f'{stage.label}.')
+                if self.par.is_main_file():
+                    self.par.stg.stats.phase(stage.name)
+
+            for n, stage in enumerate(group):
+                if n:
+                    tokens = TokenStream(tokens)
+                tokens = self.traverse(stage, tokens)
+
+            if stream and group is groups[-1]:
+                return tokens
+
+            tokens = list(tokens)
+
+        return tokens
+
+    def traverse(self, stage, tokens):
+        '''Run a stage with its own cursor giving its output as it is released
+        The parser cursor is swapped at each step so the fused stages do not mix
+           stage = The stage to run
+           tokens = Input of the stage'''
+
+        par = self.par
+        cursor = {'tok_list_in': tokens}
+        steps = getattr(par, stage.run)()
+
+        # Only the main file is measured, the includes count on their pass
+        stats = par.stg.stats if par.is_main_file() else Stats()
+
+        while True:
+            outer = {attr: getattr(par, attr, None) for attr in self.cursor}
+            for attr, value in cursor.items():
+                setattr(par, attr, value)
+
+            stats.start(stage.name)
+            try:
+                released = next(steps, None)
+            finally:
+                stats.stop()
+                cursor = {attr: getattr(par, attr, None) for attr in self.cursor}
+                for attr, value in outer.items():
+                    setattr(par, attr, value)
+
+            # The last output may be taken without going back to the stage
+            stats.record(stage.name, tokens_in=len(tokens))
+            if released is None:
+                return
+
+            stats.count(stage.name, **{f'{stage.output}_out': len(released)})
+
+            yield from released
 
 
 # Parser ----------------------------------------------------------------------
 class Parser:
     '''Process the list of tokens sent by the lexer
-       stg = Setings object
+       ctx = Context object of the conversion
        lexed = List of tokens
        des = Language description object
        short_vars = List of short named vars used
                     (prevent conflict on included files)'''
 
-    def __init__(self, stg, lexed, des, include_vars):
+    def __init__(self, ctx, lexed, des, include_vars):
         self.tok_list_in = lexed
-        self.stg = stg
+        self.ctx = ctx
+        self.stg = ctx.stg
+        self.info = ctx.info
+        self.Token = ctx.Token
         self.reset_pass()
-        self.des = des
-        self.des.c_hard_short_vars.update(include_vars[0])
-        self.des.c_hard_long_vars.update(include_vars[1])
-        self.des.d_declares.update(include_vars[2])
+        self.program = self.tk
+        self.des = Scope(des, include_vars)
+        self.passes = Passes(self)
 
         # Run initialization on the classic module
-        self.clc = Classic.Parser(self, stg, Token)
+        self.clc = ctx.Classic.Parser(self, self.stg, self.Token)
         self.clc.initialization()
 
     def reset_pass(self):
@@ -563,9 +1323,7 @@ class Parser:
     def next_tok(self):
         '''Advance and get the next token on the token list'''
 
-        if self.index + 1 <= self.len:
-            self.index += 1
-
+        self.index += 1
         self.tk = self.tok_list_in[self.index]
 
         return self.tk
@@ -590,6 +1348,32 @@ class Parser:
 
         return self.tok_list_out[offset]
 
+    def has_ahead(self, offset):
+        '''Tell if there is a token at an offset ahead on the input list'''
+
+        try:
+            self.tok_list_in[self.index + offset]
+        except IndexError:
+            return False
+
+        return True
+
+    def release_lines(self):
+        '''Take the tokens before the last two lines out of the output list
+        The passes do not look further back than that'''
+
+        newlines = 0
+        for idx in range(len(self.tok_list_out) - 1, 0, -1):
+            if self.tok_list_out[idx].tok == 'NEWLINE':
+                newlines += 1
+                if newlines == 3:
+                    released = self.tok_list_out[:idx]
+                    del self.tok_list_out[:idx]
+
+                    return released
+
+        return []
+
     # Defines -----------------------------------------------------------------
     def get_defines(self):
         '''Get the defines definitions'''
@@ -597,7 +1381,6 @@ class Parser:
         do = self.des.d_defdop
         dc = self.des.d_defdcl
         se = self.des.d_defsep
-        def_grp = namedtuple('def_grp', 'repl varv')
 
         while True:
             self.next_tok()
@@ -605,10 +1388,10 @@ class Parser:
 
             if not def_def:
                 self.prev_tok()
-                Info.log(1, f'Define definition blank.', self.tk)
+                self.info.log(1, f'Define definition blank.', self.tk)
 
             if not re.match(self.des.d_identf, def_def.val):
-                Info.log(1, f'Invalid define name: {def_def.val}', def_def)
+                self.info.log(1, f'Invalid define name: {def_def.val}', def_def)
 
             def_var = None
             def_rep = self.get_defined_content(f'{do}{dc}', 2)
@@ -617,14 +1400,14 @@ class Parser:
 
             def_rep = def_rep[0]
             if def_def.lval in self.des.d_defines:
-                Info.log(1, f'Define name duplicated: {def_def.val}', def_def)
+                self.info.log(1, f'Define name duplicated: {def_def.val}', def_def)
 
-            self.des.d_defines[def_def.lval] = (def_grp(def_rep, def_var))
+            self.des.d_defines[def_def.lval] = Define(def_rep, def_var)
 
             tk = self.next_tok()
             if tk.val != se:
                 if tk.tok != 'NEWLINE':
-                    Info.log(1, f'Expecting: {se}', self.tk)
+                    self.info.log(1, f'Expecting: {se}', self.tk)
                 break
 
     def get_defined_content(self, delim, recur=1):
@@ -637,7 +1420,7 @@ class Parser:
         dc = delim[1]
 
         if self.tk.val != do:
-            Info.log(1, f'Expecting: {do}', self.tk)
+            self.info.log(1, f'Expecting: {do}', self.tk)
 
         var = []
         part = []
@@ -647,16 +1430,16 @@ class Parser:
 
             tk = self.next_tok()
             if tk.tok == 'NEWLINE' and balance:
-                Info.log(1, f'Unbalanced {do}{dc}', self.tk)
+                self.info.log(1, f'Unbalanced {do}{dc}', self.tk)
 
             elif tk.val == do:
                 if len(balance) >= recur:
-                    Info.log(1, f'Too many opened "{do}"', self.tk)
+                    self.info.log(1, f'Too many opened "{do}"', self.tk)
 
                 balance.append(do)
                 pos = self.tk.pos
                 var.append(self.get_defined_content(f'{do}{dc}'))
-                part.append(Token(tok='D_DEFVAR',
+                part.append(self.Token(tok='D_DEFVAR',
                                   val='VAR',
                                   pos=pos))
                 self.prev_tok()
@@ -665,7 +1448,7 @@ class Parser:
 
             elif tk.val == dc:
                 if not balance:
-                    Info.log(1, f'Too many closed "{dc}"', self.tk)
+                    self.info.log(1, f'Too many closed "{dc}"', self.tk)
 
                 balance.pop()
 
@@ -676,38 +1459,41 @@ class Parser:
 
             part.append(tk)
 
-    def replace_define(self):
-        '''Replace the defines for their content throughout the code'''
+    def replace_define(self, depth=0):
+        '''Replace the defines for their content throughout the code
+           depth = Defines it is nested in on their variables'''
 
         do = self.des.d_defdop
         dc = self.des.d_defdcl
         vo = self.des.d_defvop
         vc = self.des.d_defvcl
-        define = []
         def_var = []
         balance = [vo]
 
         def_def = self.get_in_bracket(f'{do}{dc}')
         if not def_def:
-            Info.log(1, f'Define blank.', self.tk)
+            self.info.log(1, f'Define blank.', self.tk)
 
         if not def_def.lval.replace(self.des.d_idsnake, '').isalnum() \
                 and def_def.lval != self.des.c_print_alt:
-            Info.log(1, f'{def_def.val} invalid define name.', def_def)
+            self.info.log(1, f'{def_def.val} invalid define name.', def_def)
 
         if def_def.lval not in self.des.d_defines:
-            Info.log(1, f'{def_def.val} define not defined.', def_def)
+            self.info.log(1, f'{def_def.val} define not defined.', def_def)
+
+        if depth >= self.des.d_defdepth:
+            self.info.log(1, f'{def_def.val} define nested too deep.', def_def)
 
         if self.tk.tok == 'C_SYMBOL' and self.tk.val == vo:
             while True:
 
                 tk = self.next_tok()
                 if tk.tok == 'NEWLINE' and balance:
-                    Info.log(1, f'Missing {vc}', tk)
+                    self.info.log(1, f'Missing {vc}', tk)
 
                 # If define has variable, recurse it
                 elif tk.val == do:
-                    def_var.extend(self.replace_define())
+                    def_var.extend(self.replace_define(depth + 1))
                     continue
 
                 elif tk.val == vo:
@@ -722,30 +1508,28 @@ class Parser:
 
             self.next_tok()
 
-        insert_var = self.des.d_defines[def_def.lval].varv
-        if def_var:
-            insert_var = def_var
+        # Defines given by the classic modules are compiled on their first use
+        define = self.des.d_defines[def_def.lval]
+        if not isinstance(define, Define):
+            define = Define(define.repl, define.varv)
+            self.des.d_defines[def_def.lval] = define
 
-        for d in self.des.d_defines[def_def.lval].repl:
-            if d.tok == 'D_DEFVAR':
-                for v in insert_var:
-                    define.append(v.copy())
+        insert_var = def_var or define.varv or []
 
-                continue
-
-            d.pos.lin = def_def.pos.lin
-            d.pos.col = def_def.pos.col
-            define.append(d.copy())
+        size = define.size + define.slots * len(insert_var)
+        if size > self.des.d_defsize:
+            self.info.log(1, f'{def_def.val} define too big: {size} tokens.', def_def)
 
         self.prev_tok()
 
-        return define
+        return define.expand(self.Token, def_def.pos, insert_var)
 
     # Declares ----------------------------------------------------------------
     def get_declares(self):
         '''Get the declares definitions'''
 
         vc = self.des.c_var_valid_chars
+        conflicts = self.des.conflicts
 
         while True:
 
@@ -753,43 +1537,50 @@ class Parser:
             dec_long = self.next_tok()
 
             if not re.match(self.des.d_identf, dec_long.lval):
-                Info.log(1, f'Invalid declared variable: {dec_long.val}', dec_long)
+                self.info.log(1, f'Invalid declared variable: {dec_long.val}', dec_long)
 
             if len(dec_long.lval) == 1:
-                Info.log(1, f'Declared variable too short: {dec_long.lval}', dec_long)
+                self.info.log(1, f'Declared variable too short: {dec_long.lval}', dec_long)
 
             if dec_long.uval in self.des.c_reserved_kw:
-                Info.log(1, f'Variable is a reserved keyword: {dec_long.lval}', dec_long)
+                self.info.log(1, f'Variable is a reserved keyword: {dec_long.lval}', dec_long)
 
             # If there is no assignment (:)
             if self.peek_ahead().val == self.des.d_decsep \
                     or self.peek_ahead().tok == 'NEWLINE':
 
-                for var in self.des.d_declares:
+                # The declares are checked up to the one with the same name
+                last = None
+                if dec_long.val_w_file in self.des.d_declares:
+                    last = conflicts.declare_order(dec_long.val_w_file)
+
+                for var in conflicts.declared_as(dec_long.lval[:vc]):
+                    if last is not None and conflicts.declare_order(var) > last:
+                        break
+                    val_n_file = var.split('@')[0]
+                    self.info.log(2, f'Declared variable conflict: '
+                                f'{dec_long.lval} '
+                                f'{val_n_file}:{self.des.d_declares[var]}', dec_long)
+
+                if last is not None:
+                    var = dec_long.val_w_file
                     val_n_file = var.split('@')[0]
-                    if dec_long.lval[:vc] == self.des.d_declares[var]:
-                        Info.log(2, f'Declared variable conflict: '
-                                    f'{dec_long.lval} '
-                                    f'{val_n_file}:{self.des.d_declares[var]}', dec_long)
-                    if dec_long.val_w_file == var:
-                        Info.log(1, f'Long variable already reserved: '
-                                    f'{dec_long.lval} '
-                                    f'{val_n_file}:{self.des.d_declares[var]}', dec_long)
-
-                for var in self.des.c_hard_long_vars:
-                    if dec_long.lval[:vc] == var.var_name[:vc]:
-                        Info.log(2, f'Reserved long variable conflict: '
-                                    f'{dec_long.lval} {var.var_name}', dec_long)
-
-                for var in self.des.c_hard_short_vars:
-                    if dec_long.lval[:vc] == var:
-                        Info.log(2, f'Reserved short variable conflict: '
-                                    f'{dec_long.lval} {var}', dec_long)
+                    self.info.log(1, f'Long variable already reserved: '
+                                f'{dec_long.lval} '
+                                f'{val_n_file}:{self.des.d_declares[var]}', dec_long)
+
+                for var in conflicts.long_colliding(dec_long.lval):
+                    self.info.log(2, f'Reserved long variable conflict: '
+                                f'{dec_long.lval} {var.var_name}', dec_long)
+
+                if dec_long.lval[:vc] in self.des.c_hard_short_vars:
+                    self.info.log(2, f'Reserved short variable conflict: '
+                                f'{dec_long.lval} {dec_long.lval[:vc]}', dec_long)
 
                 if len(dec_long.lval) == vc:
-                    self.des.c_hard_short_vars.update({dec_long.lval})
+                    conflicts.add_short(dec_long.lval)
                 else:
-                    self.des.c_hard_long_vars.update({dec_long})
+                    conflicts.add_long(dec_long)
 
                 if self.peek_ahead().tok == 'NEWLINE':
                     break
@@ -804,43 +1595,50 @@ class Parser:
             dec_short = self.next_tok()
 
             if not re.match(self.des.c_varsna, dec_short.lval):
-                Info.log(1, f'Invalid declared short variable: {dec_short.lval}', dec_short)
+                self.info.log(1, f'Invalid declared short variable: {dec_short.lval}', dec_short)
 
-            for var in self.des.d_declares:
+            # The first declare with the same long or short name stops
+            same_long = dec_long.val_w_file in self.des.d_declares
+            same_short = conflicts.declared_as(dec_short.lval)[:1]
+            if same_short and same_long \
+                    and conflicts.declare_order(same_short[0]) < conflicts.declare_order(dec_long.val_w_file):
+                same_long = False
+
+            if same_long:
+                var = dec_long.val_w_file
                 val_n_file = var.split('@')[0]
-                if dec_long.val_w_file == var:
-                    Info.log(1, f'Long variable already declared: '
-                                f'{dec_long.lval}:{dec_short.lval} '
-                                f'{val_n_file}:{self.des.d_declares[var]}', dec_short)
-                if dec_short.lval == self.des.d_declares[var]:
-                    Info.log(1, f'Short variable already declared: '
-                                f'{dec_long.lval}:{dec_short.lval} '
-                                f'{val_n_file}:{self.des.d_declares[var]}', dec_short)
+                self.info.log(1, f'Long variable already declared: '
+                            f'{dec_long.lval}:{dec_short.lval} '
+                            f'{val_n_file}:{self.des.d_declares[var]}', dec_short)
+            if same_short:
+                var = same_short[0]
+                val_n_file = var.split('@')[0]
+                self.info.log(1, f'Short variable already declared: '
+                            f'{dec_long.lval}:{dec_short.lval} '
+                            f'{val_n_file}:{self.des.d_declares[var]}', dec_short)
 
-            for var in self.des.c_hard_long_vars:
-                if dec_long.val_w_file == var.val_w_file:
-                    Info.log(1, f'Long variable already reserved: '
-                                f'{dec_long.lval}:{dec_short.lval} '
-                                f'{var.lval}', dec_long)
+            if var := conflicts.long_on_file(dec_long.val_w_file):
+                self.info.log(1, f'Long variable already reserved: '
+                            f'{dec_long.lval}:{dec_short.lval} '
+                            f'{var.lval}', dec_long)
 
-            for var in self.des.c_hard_long_vars:
+            for var in conflicts.long_colliding(dec_short.lval):
                 if dec_short.lval == var.var_name[:vc]:
-                    Info.log(2, f'Reserved long variable conflict: '
+                    self.info.log(2, f'Reserved long variable conflict: '
                                 f'{dec_long.lval}:{dec_short.lval} '
                                 f'{var.var_name}', dec_short)
 
-            for var in self.des.c_hard_short_vars:
-                if dec_short.lval == var:
-                    Info.log(2, f'Reserved short variable conflict: '
-                                f'{dec_long.lval}:{dec_short.lval} '
-                                f'{var}', dec_short)
+            if dec_short.lval in self.des.c_hard_short_vars:
+                self.info.log(2, f'Reserved short variable conflict: '
+                            f'{dec_long.lval}:{dec_short.lval} '
+                            f'{dec_short.lval}', dec_short)
 
             self.des.d_declares[dec_long.val_w_file] = dec_short.lval
 
             tk = self.next_tok()
             if tk.val != self.des.d_decsep:
                 if tk.tok != 'NEWLINE':
-                    Info.log(1, f'Expecting: {self.des.d_decsep}', self.tk)
+                    self.info.log(1, f'Expecting: {self.des.d_decsep}', self.tk)
                 break
 
     # Labels ------------------------------------------------------------------
@@ -863,15 +1661,15 @@ class Parser:
             self.tok_list_out.pop()
 
         if label is None:
-            Info.log(1, f'Label error.', self.tk)
+            self.info.log(1, f'Label error.', self.tk)
 
         if not label:
-            Info.log(1, f'Label blank.', self.tk)
+            self.info.log(1, f'Label blank.', self.tk)
 
         if not re.match(self.des.d_identf, label.val):
-            Info.log(1, f'Invalid label name: {label.val}', label)
+            self.info.log(1, f'Invalid label name: {label.val}', label)
 
-        self.tk = Token(tok='D_LBLLIN',
+        self.tk = self.Token(tok='D_LBLLIN',
                         val=label.lval,
                         pos=self.tk.pos)
 
@@ -885,7 +1683,7 @@ class Parser:
         self.prev_tok()
 
         tk_pos = self.peek_ahead(-1).pos
-        self.tk = Token(tok='D_LBLJMP',
+        self.tk = self.Token(tok='D_LBLJMP',
                         val=goto.lval,
                         pos=tk_pos)
 
@@ -893,7 +1691,7 @@ class Parser:
         '''Get loop labels return'''
 
         if not self.loop_labels:
-            Info.log(1, f'Loop label close without open.', self.tk)
+            self.info.log(1, f'Loop label close without open.', self.tk)
 
         label = self.loop_labels.pop()
 
@@ -904,7 +1702,7 @@ class Parser:
 
         self.tok_list_out.extend(self.tok_str(self.des.c_loop_back))
 
-        self.tk = Token(tok='D_LBLRET',
+        self.tk = self.Token(tok='D_LBLRET',
                         val=label.lval,
                         pos=self.tk.pos)
 
@@ -913,7 +1711,7 @@ class Parser:
 
         self.tok_list_out.extend(self.tok_str(self.des.c_loop_back))
 
-        self.tk = Token(tok='D_LBLEXT',
+        self.tk = self.Token(tok='D_LBLEXT',
                         val=self.loop_labels[-1].lval,
                         pos=self.tk.pos)
 
@@ -927,14 +1725,14 @@ class Parser:
         dc = delim[1]
 
         if self.tk.val != do:
-            Info.log(1, f'Expecting: {do}', self.tk)
+            self.info.log(1, f'Expecting: {do}', self.tk)
 
         content = self.next_tok()
         if content.val == dc:
             return ''
 
         if self.next_tok().val != dc:
-            Info.log(1, f'Closing "{dc}" not found.', self.tk)
+            self.info.log(1, f'Closing "{dc}" not found.', self.tk)
 
         self.next_tok()
 
@@ -948,10 +1746,10 @@ class Parser:
 
         func = self.next_tok()
         if self.in_func:
-            Info.log(1, f'Already inside a function.', self.in_func)
+            self.info.log(1, f'Already inside a function.', self.in_func)
 
         if func.lval in self.des.d_functions:
-            Info.log(1, f'Function name duplicated: {func.val}', func)
+            self.info.log(1, f'Function name duplicated: {func.val}', func)
 
         func_def_args_tmp = self.get_func_args(func)
         self.func_def_args = []  # this is the a in: func(a=b)
@@ -962,16 +1760,16 @@ class Parser:
             new_arg = args
 
             if not args:
-                Info.log(1, f'Function definition missing  argument: '
+                self.info.log(1, f'Function definition missing  argument: '
                             f'{func.val}', func)
 
             if args[0].tok != 'D_IDNTTP':
-                Info.log(1, f'Function definition only takes variables: '
+                self.info.log(1, f'Function definition only takes variables: '
                             f'{args[0].val}', args[0])
 
             if len(args) > 1:
                 if args[1].val != fe:
-                    Info.log(1, f'Function definition only takes one variable: '
+                    self.info.log(1, f'Function definition only takes one variable: '
                                 f'{args[1].val}', args[1])
 
                 new_arg = [args[0]]
@@ -981,10 +1779,10 @@ class Parser:
             self.func_def_equl.append(new_equ)
 
         if not all(i for i in self.func_def_args):
-            Info.log(1, f'Empty argument in function definition.', func)
+            self.info.log(1, f'Empty argument in function definition.', func)
 
         self.tk.pos.col = 1
-        self.tk = Token(tok='D_FUNCDF',
+        self.tk = self.Token(tok='D_FUNCDF',
                         val=func.lval,
                         pos=self.tk.pos.copy())
 
@@ -1001,7 +1799,7 @@ class Parser:
         func_def = namedtuple('func_def', 'args rets equl')
 
         if not self.in_func:
-            Info.log(1, f'Ret without function.', self.tk)
+            self.info.log(1, f'Ret without function.', self.tk)
 
         tk = self.peek_ahead()
         if tk.val != ar and tk.tok != 'C_INSTSP' and tk.tok != 'NEWLINE':
@@ -1021,7 +1819,7 @@ class Parser:
                 ret_tok.append(tk)
 
         if not all(i for i in ret_list):
-            Info.log(1, f'Function return missing variable.', last_ret_tok)
+            self.info.log(1, f'Function return missing variable.', last_ret_tok)
 
         self.tk = self.tok_str(self.des.c_func_ret)[0]
         self.des.d_functions[self.in_func.lval] = func_def(self.func_def_args, ret_list, self.func_def_equl)
@@ -1038,12 +1836,12 @@ class Parser:
         equ_tok = self.tok_str(self.des.c_equal)[0]
         ins_tok = self.tok_str(self.des.c_instsp_str)[0]
         fcl_tok = self.tok_str(self.des.c_func_call)[0]
-        fun_tok = Token(tok='D_FUNCAL',
+        fun_tok = self.Token(tok='D_FUNCAL',
                         val=func.lval,
                         pos=func.pos)
 
         if func.lval not in self.des.d_functions:
-            Info.log(1, f'Function not defined: {func.val}', func)
+            self.info.log(1, f'Function not defined: {func.val}', func)
 
         cal_vars = []
         var_tok = []
@@ -1080,11 +1878,11 @@ class Parser:
                 continue
 
             if var[0].tok != 'D_IDNTTP':
-                Info.log(1, f'Function definition only takes variables: '
+                self.info.log(1, f'Function definition only takes variables: '
                             f'{var[0].val}', var[0])
 
             if len(var) > 1:
-                Info.log(1, f'Function definition only takes one variable: '
+                self.info.log(1, f'Function definition only takes one variable: '
                             f'{var[1].val}', var[1])
 
         cal_args = self.get_func_args(func)
@@ -1094,10 +1892,10 @@ class Parser:
         cal_equl = self.des.d_functions[func.lval].equl
 
         if len(cal_args) > len(def_args):
-            Info.log(1, f'Function arguments mismatch.', func)
+            self.info.log(1, f'Function arguments mismatch.', func)
 
         if len(cal_vars) > len(def_rets):
-            Info.log(1, f'Function variable mismatch.', func)
+            self.info.log(1, f'Function variable mismatch.', func)
 
         func_call = []
 
@@ -1155,11 +1953,11 @@ class Parser:
         func_args = []
 
         if func.tok != 'D_FUNCNM':
-            Info.log(1, f'Invalid function name: {func.val}', func)
+            self.info.log(1, f'Invalid function name: {func.val}', func)
 
         tk = self.next_tok()
         if tk.val != fo:
-            Info.log(1, f'Missing {fo}', self.tk)
+            self.info.log(1, f'Missing {fo}', self.tk)
 
         if self.peek_ahead().val == fc:
             self.next_tok()
@@ -1169,7 +1967,7 @@ class Parser:
             tk = self.next_tok()
 
             if tk.tok == 'NEWLINE' and balance:
-                Info.log(1, f'Unbalanced {fo}{fc}', tk)
+                self.info.log(1, f'Unbalanced {fo}{fc}', tk)
 
             elif tk.val == fo:
                 balance.append(tk.val)
@@ -1200,10 +1998,10 @@ class Parser:
                 break
 
             if keep.tok != 'D_TGLREM':
-                Info.log(1, f'Invalid keep tag: {keep.val}', keep)
+                self.info.log(1, f'Invalid keep tag: {keep.val}', keep)
 
             if keep.val in self.des.d_keeps:
-                Info.log(1, f'Keep tag duplicated: {keep.val}', keep)
+                self.info.log(1, f'Keep tag duplicated: {keep.val}', keep)
 
             self.des.d_keeps.append(keep.uval)
 
@@ -1226,7 +2024,7 @@ class Parser:
             tk = self.next_tok()
 
             if tk.tok == 'EOF':
-                Info.log(1, f'Toggle rem not closed from {toggle.val}', toggle)
+                self.info.log(1, f'Toggle rem not closed from {toggle.val}', toggle)
 
             elif tk.tok == 'NEWLINE' and not tog_block:
                 break
@@ -1246,7 +2044,7 @@ class Parser:
         include_file = include.val.strip(qs).strip()
 
         if include.tok != 'C_LITQUO' or not include_file:
-            Info.log(1, f'Include error: {include.val}', self.tk)
+            self.info.log(1, f'Include error: {include.val}', self.tk)
 
         if not os.path.isabs(include_file):
             include_file = os.path.join(self.stg.file_path, include_file)
@@ -1257,21 +2055,16 @@ class Parser:
                             include.pos.offset,
                             include.pos.text,
                             include.pos.file)
-        include_code = IO.load_file(include, include_file,
-                                    self.stg.load_format, self.stg.tab_lenght)
 
         verbose = self.stg.verbose_level
-        self.stg.verbose_level = 1
-
-        lex = Lexer(self.stg, include_code)
-        lexed = lex.lex()
 
         include_vars = (self.des.c_hard_short_vars,
                         self.des.c_hard_long_vars,
                         self.des.d_declares)
 
-        par = Parser(self.stg, lexed, lex.des, include_vars)
-        parsed, include_vars = par.par()
+        parsed, include_vars = self.ctx.includes.process(
+            include_file, include_vars,
+            lambda include_file, include_vars: self.process_include(include, include_file, include_vars))
 
         self.des.c_hard_short_vars = include_vars[0]
         self.des.c_hard_long_vars = include_vars[1]
@@ -1280,7 +2073,35 @@ class Parser:
         if self.is_main_file():
             self.stg.verbose_level = verbose
 
-        self.tok_list_out.extend(parsed[2:-2])
+        self.tok_list_out.extend(parsed)
+
+    def process_include(self, include, include_file, include_vars):
+        '''Load, lex and run the first passes on an included file
+        Return the tokens to add and the variables after the include
+           include = Position of the include for the error messages
+           include_file = Name of the file
+           include_vars = Variables brought from the including file'''
+
+        # Use the file if already read on the background
+        prefetched = self.ctx.prefetch.take(include_file)
+        if prefetched is None:
+            include_code = IO.load_file(include, include_file,
+                                        self.stg.load_format, self.stg.tab_lenght)
+        self.ctx.build.read(include_file)
+        self.stg.stats.include()
+
+        self.stg.verbose_level = 1
+
+        if prefetched is None:
+            lexed = Lexer(self.ctx, include_code).lex()
+        else:
+            lexed, messages = prefetched
+            Infolog.emit(messages)
+
+        par = Parser(self.ctx, lexed, self.ctx.des, include_vars)
+        parsed, include_vars = par.par()
+
+        return parsed[2:-2], include_vars
 
     # Rem header --------------------------------------------------------------
     def insert_rem_header(self, idx, lin, text):
@@ -1290,7 +2111,7 @@ class Parser:
            text: Text to insert'''
 
         tok_rem = self.tok_str(self.des.c_altrem, pos=self.tk.pos.copy(col=0))[0]
-        tok_lit = Token(tok='C_LINREM', val=text, pos=self.tk.pos.copy(col=1))
+        tok_lit = self.Token(tok='C_LINREM', val=text, pos=self.tk.pos.copy(col=1))
         tok_nl = self.tok_str(self.des.newline_str, pos=self.tk.pos.copy(col=len(text)))[0]
 
         self.tok_list_in.insert(idx, tok_rem)
@@ -1305,56 +2126,32 @@ class Parser:
            text = The string to convert into tokens
            pos = The position object for the tokens'''
 
-        tokens = []
+        if not pos:
+            pos = self.tk.pos.copy()
+            pos.col -= 1
 
-        while True:
-            if not pos:
-                pos = self.tk.pos.copy()
-                pos.col -= 1
-            partial = ''
-            match_group = ''
-            text_in = text + ' '
-
-            while True:
-                next_char = text_in[0]
-
-                g = self.des.commands.match(partial + next_char)
-                if not g:
-                    if not partial:
-                        match_group = None
-                        partial = next_char
-                    token = Token(tok=match_group,
-                                  val=partial.strip(' '),
-                                  pos=pos)
-                    break
-
-                partial += next_char
-                text_in = text_in[1:]
-                match_group = g.lastgroup
-
-            tokens.append(token)
-
-            text = text[len(token.val):].strip()
-            if not text:
-                return tokens
+        return [self.Token(tok=match_group, val=val, pos=pos)
+                for match_group, val in self.des.template(text)]
 
     def is_main_file(self):
         '''Check if the main file is being processed.
         (avoid processing too much when including a file)'''
 
-        return self.tok_list_out[0].pos.file == self.stg.file_load
+        return self.program.pos.file == self.stg.file_load
 
-    def par(self):
-        '''Consolidate all the parser passes, limiting the access of the includes'''
+    def par(self, stream=False):
+        '''Consolidate all the parser passes, limiting the access of the includes
+           stream = Leave the fifth pass to run along with generate_stream()'''
 
-        self.pass_1()
-        self.pass_2()
-        self.pass_3()
+        stages = ['pass_1', 'pass_2', 'pass_3']
 
         # Included files do not go through the next passes
         if self.is_main_file():
-            self.pass_4()
-            self.pass_5()
+            stages.append('pass_4')
+            if not stream:
+                stages.append('pass_5')
+
+        self.tok_list_out = self.passes.run(stages, self.tok_list_in)
 
         include_vars = (self.des.c_hard_short_vars,
                         self.des.c_hard_long_vars,
@@ -1367,7 +2164,7 @@ class Parser:
         '''First parser pass
         Preparations, rem toggles, dignified instructions and replace defines'''
 
-        Info.log(5, f'Pass 1.')
+        self.reset_pass()
 
         self.in_func = None
         self.tok_list_out.append(self.next_tok())
@@ -1418,7 +2215,7 @@ class Parser:
                     self.get_func_ret()
 
                 else:
-                    Info.log(1, f'{self.tk.val} must be at the start of a line.', self.tk)
+                    self.info.log(1, f'{self.tk.val} must be at the start of a line.', self.tk)
 
             # Define replacement
             elif self.tk.tok == 'D_SYMBOL' and self.tk.val == do:
@@ -1440,14 +2237,13 @@ class Parser:
             if self.tk.tok == 'EOF':
                 break
 
+        yield self.tok_list_out
+
     # Pass 2 ------------------------------------------------------------------
     def pass_2(self):
         '''Second parser pass, record code flow
         Function calls and labels'''
 
-        Info.log(5, f'Pass 2.')
-
-        self.tok_list_in = self.tok_list_out
         self.reset_pass()
 
         self.loop_labels = []
@@ -1492,21 +2288,23 @@ class Parser:
             if self.tk.tok == 'EOF':
                 break
 
+            if self.tk.tok == 'NEWLINE':
+                yield self.release_lines()
+
         # Post pass -----------------------------------------------------------
         if self.loop_labels:
-            Info.log(1, f'Loop label not closed from: '
+            self.info.log(1, f'Loop label not closed from: '
                         f'{self.loop_labels[-1].val}', self.loop_labels[-1])
         if self.in_func:
-            Info.log(1, f'Func without ret: {self.in_func.val}', self.in_func)
+            self.info.log(1, f'Func without ret: {self.in_func.val}', self.in_func)
+
+        yield self.tok_list_out
 
     # Pass 3 ------------------------------------------------------------------
     def pass_3(self):
         '''Third parser pass, add and remove
         Includes, rem blocks, remove excess newlines, join lines and strings'''
 
-        Info.log(5, f'Pass 3.')
-
-        self.tok_list_in = self.tok_list_out
         self.reset_pass()
 
         qs = self.des.c_quotes
@@ -1559,13 +2357,13 @@ class Parser:
             elif self.tk.tok == 'NEWLINE' \
                     and self.last_tok().tok == 'D_INSTSP':
                 self.tok_list_out.pop()
-                if self.index < self.len - 3:
+                if self.has_ahead(3):
                     continue
 
             # Remove newline after instruction separator
             elif self.tk.tok == 'NEWLINE' \
                     and self.last_tok().tok == 'C_INSTSP':
-                if self.index < self.len - 3:
+                if self.has_ahead(3):
                     continue
 
             # Remove newline before instruction separator
@@ -1608,14 +2406,17 @@ class Parser:
             if self.tk.tok == 'EOF':
                 break
 
+            if self.tk.tok == 'NEWLINE':
+                yield self.release_lines()
+
+        yield self.tok_list_out
+
     # Pass 4 ------------------------------------------------------------------
     def pass_4(self):
         '''Fourth parser pass, apply code flow and line numbers
-        Replace labels with lines and apply line numbers and header'''
-
-        Info.log(5, f'Pass 4.')
+        Replace labels with lines and apply line numbers and header
+        The output is only given at the end, after the jumps are filled'''
 
-        self.tok_list_in = self.tok_list_out
         self.reset_pass()
 
         line_number = self.stg.line_start - self.stg.line_step
@@ -1709,10 +2510,10 @@ class Parser:
 
                 # Line cannot start with number
                 if start_tok.val.isdigit():
-                    Info.log(1, f'Line starting with number: {start_tok.val}', tok=start_tok)
+                    self.info.log(1, f'Line starting with number: {start_tok.val}', tok=start_tok)
 
                 self.tok_list_out.append(self.tk)
-                self.tok_list_out.append(Token(tok='C_LINENB',
+                self.tok_list_out.append(self.Token(tok='C_LINENB',
                                                val=line_number,
                                                pos=self.tk.pos.copy(lin=line,
                                                                     col=0)))
@@ -1738,28 +2539,27 @@ class Parser:
         for l in self.label_jumps:
             if l.label not in self.label_lines:
                 error_tok = self.tok_list_out[l.index]
-                Info.log(1, f'Label does not exist: {error_tok.val}', error_tok)
+                self.info.log(1, f'Label does not exist: {error_tok.val}', error_tok)
             self.tok_list_out[l.index].val = self.label_lines[l.label]
 
         # Replace loop labels exit placeholders for line numbers
         for l in llabels_exit:
             if llabels_ret[l.label] > line_number - self.stg.line_step:
                 error_tok = self.tok_list_out[l.index]
-                Info.log(1, f'Loop exit past end of program.', error_tok)
+                self.info.log(1, f'Loop exit past end of program.', error_tok)
             self.tok_list_out[l.index].val = llabels_ret[l.label]
 
         # Replace function calls placeholders for line numbers
         for l in func_call:
             self.tok_list_out[l.index].val = func_defs[l.func]
 
+        yield self.tok_list_out
+
     # Pass 5 ------------------------------------------------------------------
     def pass_5(self):
         '''Fifth parser pass, classic alterations
         Mostly on the classic module, capitalize'''
 
-        Info.log(5, f'Pass 5.')
-
-        self.tok_list_in = self.tok_list_out
         self.reset_pass()
 
         while True:
@@ -1789,33 +2589,57 @@ class Parser:
             if self.tk.tok == 'EOF':
                 break
 
+            if self.tk.tok == 'NEWLINE':
+                yield self.release_lines()
+
+        yield self.tok_list_out
+
     # Code generation ---------------------------------------------------------
     def generate(self):
         '''Generate the output code'''
 
-        Info.log(5, f'Generating.')
+        self.c_code = self.passes.run(['generate'], self.tok_list_out)
+
+        return self.c_code, self.des.d_declares, self.line_report
+
+    def generate_stream(self):
+        '''Generate the output code running the fifth pass along
+        The tokens of the fourth pass are released as they are used
+        Give the lines as they are done'''
+
+        tokens = TokenStream(TokenStream.drain(self.tok_list_out))
+
+        return self.passes.run(['pass_5', 'generate'], tokens, stream=True)
+
+    def generate_lines(self):
+        '''Generate the output code giving one line at a time
+        The texts of a line are collected on c_line and joined when it is done'''
 
-        self.tok_list_in = self.tok_list_out
         self.reset_pass()
 
         self.next_tok()
 
         self.line = []
-        self.c_line = ''
-        self.c_code = []
+        self.c_line = []
+        self.c_last = ''
+        self.lines_generated = 0
 
         lr = self.des.c_lab_rep_rem
         nn = self.des.newline_str_n
+        gs = self.stg.general_spaces
+        reserved_kw = self.des.c_reserved_set
+        symb_comp = self.des.c_symb_set
+        untranslatable = self.des.c_untranslatable_re
 
         while True:
 
             self.next_tok()
 
             if self.stg.translate:
-                for c in str(self.tk.val):
-                    if ord(c) > 256:
-                        Info.log(1, f'Translate cannot encode '
-                                    f'character: {c} ({ord(c)})', self.tk)
+                if c := untranslatable.search(str(self.tk.val)):
+                    c = c.group()
+                    self.info.log(1, f'Translate cannot encode '
+                                f'character: {c} ({ord(c)})', self.tk)
 
             if self.tk.val:
                 self.line.append(self.tk)
@@ -1833,84 +2657,355 @@ class Parser:
                     elif ctk:
                         self.tk = ctk
 
+                    reserved = self.token.uval in reserved_kw
+
                     # Add spaces before token
-                    if self.token.uval in self.des.c_reserved_kw \
-                            and self.c_line[-1] != ' ' \
-                            and self.line[self.n - 1].val not in self.des.c_symb_comp:
-                        self.c_line += self.stg.general_spaces
+                    if reserved \
+                            and self.c_last != ' ' \
+                            and self.line[self.n - 1].val not in symb_comp:
+                        self.emit(gs)
 
-                    self.c_line += str(self.token.val)
+                    self.emit(str(self.token.val))
 
                     # Add spaces after token
-                    if self.token.tok != 'NEWLINE' \
-                        and self.token.tok == 'C_LINENB' \
-                        or (self.token.uval in self.des.c_reserved_kw
-                            and self.line[self.n + 1].val not in self.des.c_symb_comp):
-                        self.c_line += self.stg.general_spaces
+                    if self.token.tok == 'C_LINENB' \
+                        or (reserved
+                            and self.line[self.n + 1].val not in symb_comp):
+                        self.emit(gs)
+
+                c_line = ''.join(self.c_line)
 
                 # Add label report to the end of the line
                 if self.stg.label_report:
                     if line_number in self.label_report:
                         labels = ' '.join(self.label_report[line_number])
-                        self.c_line = f'{self.c_line.rstrip()}{lr}{labels}'
+                        c_line = f'{c_line.rstrip()}{lr}{labels}'
 
                 # Add a linefeed to the end of the line
-                self.c_line = self.c_line.rstrip() + nn
+                c_line = c_line.rstrip() + nn
 
                 # Check line size
-                line_len = len(self.c_line) - 1
+                line_len = len(c_line) - 1
                 if line_len > 256:
-                    Info.log(1, f'Line too long: {line_len} characters', self.tk)
+                    self.info.log(1, f'Line too long: {line_len} characters', self.tk)
 
                 # Add line ----------------------------------------------------
-                self.c_code.append(self.c_line)
+                yield [c_line]
+                self.lines_generated += 1
 
-                self.c_line = ''
+                self.c_line = []
+                self.c_last = ''
                 self.line = []
 
             # EOF -------------------------------------------------------------
             if self.tk.tok == 'EOF':
                 break
 
-        return self.c_code, self.des.d_declares, self.line_report
+    def emit(self, text):
+        '''Add a text to the line being generated keeping its last character'''
+
+        if text:
+            self.c_line.append(text)
+            self.c_last = text[-1]
+
+
+# Build cache -----------------------------------------------------------------
+class BuildCache:
+    '''Keep the files saved by a conversion to give them back when nothing changed
+    A build is kept with the files saved, the messages shown, the converted code
+    and the reports, keyed by the program, the settings and the modules,
+    and used again only if the files it included are still the same
+       ctx = Context object of the conversion'''
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.stg = ctx.stg
+        self.folder = os.path.join(self.stg.LOCAL_PATH, 'cache', 'builds')
+
+        # Files included and saved by the conversion
+        self.files = {}
+        self.saved = []
+
+    def read(self, *files):
+        '''Keep the content of files included by the conversion'''
+
+        for file_load in files:
+            if file_load not in self.files:
+                self.files[file_load] = Cache.digest(file_load)
+
+    def wrote(self, file_save):
+        '''Keep the name of a file saved by the conversion'''
+
+        if file_save not in self.saved:
+            self.saved.append(file_save)
 
+    def modules(self):
+        '''Get the source and .ini files of Badig and of the system modules'''
 
-def report_output(report_list, header, list_type, file_save, print_report):
-    '''Print or save a report list adding the type to the file name
-       report_list = The output list
-       header = A header to the list
-       list_type = The type of the list'''
-    report_list = header + report_list
-    file_save = f'{os.path.splitext(file_save)[0]}_{list_type}.txt'
+        files = [os.path.abspath(__file__)]
+        files += [os.path.join(self.stg.LOCAL_PATH, name)
+                  for name in sorted(os.listdir(self.stg.LOCAL_PATH))
+                  if name.endswith(('.py', '.ini'))]
 
-    if print_report:
-        [print(t.rstrip()) for t in report_list]
+        system_path = os.path.dirname(os.path.abspath(self.stg.Classic.__file__))
+        for folder, folders, names in os.walk(system_path):
+            folders[:] = sorted(name for name in folders if name != '__pycache__')
+            files += [os.path.join(folder, name) for name in sorted(names)
+                      if name.endswith(('.py', '.ini'))]
 
-    else:
-        IO.save_file(None, report_list, file_save, 'UTF-8')
-        Info.log(4, f'{file_save} saved.')
+        return files
+
+    def key(self):
+        '''Make the key of the conversion or None if the program can't be read'''
+
+        file_hash = Cache.digest(self.stg.file_load)
+        if file_hash is None:
+            return None
+
+        settings = repr((sorted(vars(self.stg.args).items()),
+                         sorted(vars(self.stg.c_stg).items()),
+                         os.path.abspath(self.stg.file_load),
+                         os.path.abspath(self.stg.file_save)))
+
+        key = hashlib.sha256()
+        for text in (file_hash, settings):
+            key.update(text.encode('utf-8'))
+        for module in self.modules():
+            key.update(f'{module}:{Cache.digest(module)}'.encode('utf-8'))
+
+        return key.hexdigest()
+
+    def load(self, key):
+        '''Get a kept build or None
+        The files it included must not have changed'''
+
+        build = Cache(os.path.join(self.folder, f'{key}.build'), [], key).load()
+        if build is None:
+            return None
+
+        for file_load, file_hash in build['files'].items():
+            if Cache.digest(file_load) != file_hash:
+                return None
+
+        return build
+
+    def restore(self, build):
+        '''Write back the files saved by a kept build, False if one can't be written'''
+
+        for file_save, content in build['saved']:
+            try:
+                with open(file_save, 'wb') as f:
+                    f.write(content)
+            except OSError:
+                return False
+
+        return True
+
+    def process(self, convert):
+        '''Convert the program or give back the files of the same conversion kept before
+           convert = Function converting the program and running the tokenizer'''
+
+        if not self.stg.build_cache or not self.stg.save:
+            return convert()
+
+        # Kept build: show its messages and use its results
+        key = self.key()
+        build = None if key is None else self.load(key)
+        if build is not None and self.restore(build):
+            Infolog.emit(build['messages'])
+            self.ctx.info.log(3, 'Build cache hit.')
+            for file_save, _ in build['saved']:
+                self.ctx.info.log(4, f'Restored: {file_save}')
+            if self.stg.print_report:
+                for report_list in build['reports'].values():
+                    [print(t.rstrip()) for t in report_list]
+
+            self.files = dict(build['files'])
+            self.saved = [file_save for file_save, _ in build['saved']]
+            self.stg.line_list = build['line_list']
+            self.stg.file_save = build['file_save']
+            self.ctx.c_code = build['code']
+            self.ctx.reports.update(build['reports'])
+            return
+
+        # New build: keep the messages as they are shown
+        output = getattr(Infolog.capture, 'output', None)
+        messages = [] if output is None else output
+        start = len(messages)
+        if output is None:
+            Infolog.capture.record = messages
+        try:
+            convert()
+        finally:
+            Infolog.capture.record = None
+
+        if key is None:
+            return
+
+        # The tokenizer may have deleted some of them
+        saved = []
+        for file_save in self.saved:
+            try:
+                with open(file_save, 'rb') as f:
+                    saved.append((file_save, f.read()))
+            except OSError:
+                pass
+
+        code = self.ctx.c_code
+        build = {'files': self.files,
+                 'saved': saved,
+                 'messages': messages[start:],
+                 'line_list': self.stg.line_list,
+                 'file_save': self.stg.file_save,
+                 'code': None if code is None else list(code),
+                 'reports': dict(self.ctx.reports)}
+        Cache(os.path.join(self.folder, f'{key}.build'), [], key).save(build)
+
+
+# Context ---------------------------------------------------------------------
+class Context:
+    '''Hold everything a conversion changes so many can run on the same interpreter
+    The language description is shared, read only, by the conversions of a system
+       stg = Settings object already initialized'''
+
+    def __init__(self, stg):
+        self.stg = stg
+
+        # Classic modules
+        self.Classic = stg.Classic
+        self.Tools = stg.Tools
+
+        self.des = Description.shared(stg)
+
+        # Tokens of this conversion, counted apart from the others
+        self.Token = type('Token', (Token,), {'des': self.des, 'created': 0, '__slots__': ()})
+
+        # Messages with the verbose of this conversion
+        infolog = Infolog()
+        infolog.level = stg.verbose_level
+        self.info = Info(infolog)
+
+        # Included files already processed and being read
+        self.includes = IncludeCache(self)
+        self.prefetch = IncludePrefetch(self)
+
+        # Files of the conversion kept to be given back
+        self.build = BuildCache(self)
+
+        # Converted code and reports
+        self.c_code = None
+        self.reports = {}
 
 
 # Main class ------------------------------------------------------------------
 class Main:
-    def __init__(self):
+    def __init__(self, ctx):
         # settings defined earlier to get the system info and import modules dynamically
-        self.stg = stg
-
-        if self.stg.code_is_ascii:
-            self.classic()
-        else:
-            self.dignified()
+        self.ctx = ctx
+        self.stg = ctx.stg
+        self.info = ctx.info
+        self.stg.stats = Stats(self.stg.stats_report, lambda: ctx.Token.created,
+                               self.stg.profile, self.stg.stats_memory)
+
+        try:
+            try:
+                ctx.build.process(self.classic if self.stg.code_is_ascii else self.dignified)
+            finally:
+                ctx.prefetch.close()
+
+            # Save the files the conversion depends on
+            if self.stg.depfile and self.stg.save:
+                self.save_depfile()
+
+            # Run the emulator ------------------------------------------------
+            if self.stg.save:
+                run = self.ctx.Tools.Interface(self.stg)
+                run.emulate()
+        finally:
+            self.stg.stats.close()
+
+        # Save stats report
+        if self.stg.stats_report and self.stg.save:
+            file_stats = self.stg.stats.save(self.stg.file_save,
+                                             {'file': os.path.basename(self.stg.file_load),
+                                              'system': self.stg.system_id,
+                                              'streaming': self.stg.streaming})
+            self.info.log(4, f'{file_stats} saved.')
+
+        # Save profile and show the slowest functions of each phase
+        if self.stg.profile and self.stg.save:
+            file_profile, summary = self.stg.stats.save_profile(self.stg.file_save)
+            self.info.log(4, f'{file_profile} saved.')
+            header = [f'{os.path.split(self.stg.file_load)[1]} profile\r',
+                      f'{self.stg.profile} slowest functions of each phase\r\r']
+            self.report_output(summary, header, 'profile')
+
+    def report_output(self, report_list, header, list_type):
+        '''Print or save a report list adding the type to the file name
+           report_list = The output list
+           header = A header to the list
+           list_type = The type of the list'''
+        report_list = header + report_list
+        file_save = f'{os.path.splitext(self.stg.file_save)[0]}_{list_type}.txt'
+        self.ctx.reports[list_type] = report_list
+
+        if self.stg.print_report:
+            [print(t.rstrip()) for t in report_list]
+
+        elif self.stg.save:
+            IO.save_file(None, report_list, file_save, 'UTF-8')
+            self.ctx.build.wrote(file_save)
+            self.info.log(4, f'{file_save} saved.')
+
+    def save_depfile(self):
+        '''Save the files saved by the conversion and the ones it depends on
+        as a make rule (.d) and as json (_deps.json)'''
+
+        build = self.ctx.build
+        modules = build.modules()
+        files = {'targets': [file_save for file_save in build.saved if os.path.isfile(file_save)],
+                 'source': [self.stg.file_load],
+                 'includes': list(build.files),
+                 'ini': [module for module in modules if module.endswith('.ini')],
+                 'modules': [module for module in modules if module.endswith('.py')]}
+        files = {kind: [os.path.abspath(file) for file in files[kind]] for kind in files}
+
+        depends = files['source'] + files['includes'] + files['ini'] + files['modules']
+        rule = [' '.join(self.make_path(file) for file in files['targets']) + ': \\\n']
+        rule += [f' {self.make_path(file)} \\\n' for file in depends[:-1]]
+        rule += [f' {self.make_path(depends[-1])}\n']
+
+        # Targets for the includes so make does not stop if one is removed
+        rule += [f'\n{self.make_path(file)}:\n' for file in files['includes']]
+
+        file_base = os.path.splitext(self.stg.file_save)[0]
+        for file_save, content in ((f'{file_base}.d', rule),
+                                   (f'{file_base}_deps.json', [json.dumps(files, indent=4), '\n'])):
+            IO.save_file(None, content, file_save, 'UTF-8')
+            self.info.log(4, f'{file_save} saved.')
+
+    def make_path(self, file):
+        '''Write a path relative to the current folder escaped for a make rule'''
+
+        try:
+            file = os.path.relpath(file)
+        except ValueError:
+            pass
+
+        return file.replace('$', '$$').replace('#', '\\#').replace(' ', '\\ ')
 
     # Runs expecting a classic Basic code -------------------------------------
     def classic(self):
-        Info.log(3, f'Basic Dignified: {self.stg.system_name}')
-        Info.log(3, f'  Processing: {os.path.basename(self.stg.file_load)}')
+        self.info.log(3, f'Basic Dignified: {self.stg.system_name}')
+        self.info.log(3, f'  Processing: {os.path.basename(self.stg.file_load)}')
 
         # Load classic code -------------------------------------------------
-        Info.log(4, f'Loading file: {self.stg.file_load}')
-        d_code = IO.load_file(None, self.stg.file_load,
-                              self.stg.load_format, self.stg.tab_lenght)
+        self.info.log(4, f'Loading file: {self.stg.file_load}')
+        self.stg.stats.start('loader')
+        d_code = IO.load_file(None, self.stg.file_load, self.stg.load_format,
+                              self.stg.tab_lenght, self.stg.source_text)
+        self.stg.stats.stop()
+        self.stg.stats.count('loader', lines_out=len(d_code) - 1)
 
         # Relationship between line numbers to use on the monitoring error report
         self.line_list = {}
@@ -1918,79 +3013,102 @@ class Main:
             line_number = re.match(r'^\d+', line.text)
             if not line_number:
                 err_pos = Position(d_code, lin=line.nmbr, col=-1)
-                err_pos.text = line.text
-                err_pos.file = os.path.basename(line.file)
-                err_tok = Token(pos=err_pos)
-                Info.log(1, f'Line not starting with number:', tok=err_tok)
+                err_tok = self.ctx.Token(pos=err_pos)
+                self.info.log(1, f'Line not starting with number:', tok=err_tok)
 
             self.line_list[line_number.group(0)] \
                 = (str(line.nmbr), line.text, os.path.basename(line.file))
 
         self.stg.line_list = self.line_list
 
-        # Run tools -----------------------------------------------------------
-        run = Tools.Interface(self.stg)
-        run.run()
+        # The classic code is given back as loaded, ending the lines like the converted ones
+        self.ctx.c_code = [line.text.rstrip('\r\n') + '\r' for line in d_code[1:] if line.text.strip()]
+
+        # Run the tokenizer ---------------------------------------------------
+        if self.stg.save:
+            run = self.ctx.Tools.Interface(self.stg)
+            for file_save in run.tokenize():
+                self.ctx.build.wrote(file_save)
 
     # Runs expecting a Dignified Basic code -----------------------------------
     def dignified(self):
-        Info.log(3, f'Basic Dignified: {self.stg.system_name}')
-        Info.log(3, f'Converting: {os.path.basename(self.stg.file_load)}')
+        self.info.log(3, f'Basic Dignified: {self.stg.system_name}')
+        self.info.log(3, f'Converting: {os.path.basename(self.stg.file_load)}')
 
         # Load dignified code -------------------------------------------------
-        Info.log(4, f'Loading file: {self.stg.file_load}')
-        d_code = IO.load_file(None, self.stg.file_load,
-                              self.stg.load_format, self.stg.tab_lenght)
+        self.info.log(4, f'Loading file: {self.stg.file_load}')
+        self.stg.stats.start('loader')
+        d_code = IO.load_file(None, self.stg.file_load, self.stg.load_format,
+                              self.stg.tab_lenght, self.stg.source_text)
+        self.stg.stats.stop()
+        self.stg.stats.count('loader', lines_out=len(d_code) - 1)
+
+        # The reports need all the tokens at once
+        streaming = self.stg.streaming \
+            and not self.stg.lexer_report and not self.stg.parser_report
 
         # Lex it --------------------------------------------------------------
-        Info.log(5, 'Lexing.')
+        self.info.log(5, 'Lexing.')
         t0 = time.time()
 
-        lex = Lexer(self.stg, d_code)
-        lexed = lex.lex()
+        lex = Lexer(self.ctx, d_code)
+        if streaming:
+            # The tokens are created as the parser reads them
+            lexed = TokenStream(self.stg.stats.steps('lexer', lex.stream()))
+        else:
+            self.stg.stats.start('lexer')
+            lexed = lex.lex()
+            self.stg.stats.stop()
+            self.stg.stats.count('lexer', tokens_out=len(lexed))
 
         tl = time.time() - t0
-        Info.log(5, f'{len(lexed)} tokens created in {tl:.4f}s.')
+        if not streaming:
+            self.info.log(5, f'{len(lexed)} tokens created in {tl:.4f}s.')
+
+            # Start reading the included files on the background
+            # the streamed tokens are not all there, their includes are read when met
+            self.ctx.prefetch.scan(lexed)
 
         # Save lexer token list
         if self.stg.lexer_report:
             header = [f'{os.path.split(self.stg.file_load)[1]} lexer output\r',
                       f'{len(lexed)} tokens\r\r']
             report_list = [repr(l) + '\r' for l in lexed]
-            report_output(report_list, header, 'lexer',
-                          self.stg.file_save, self.stg.print_report)
+            self.report_output(report_list, header, 'lexer')
 
         # Parse it ------------------------------------------------------------
-        Info.log(5, 'Parsing.')
+        self.info.log(5, 'Parsing.')
         t0 = time.time()
 
-        include_vars = (lex.des.c_hard_short_vars,
-                        lex.des.c_hard_long_vars,
-                        lex.des.d_declares)
+        include_vars = (set(), set(), {})
 
-        par = Parser(self.stg, lexed, lex.des, include_vars)
-        parsed, _ = par.par()
+        par = Parser(self.ctx, lexed, lex.des, include_vars)
+        parsed, _ = par.par(streaming)
 
         tp = time.time() - t0
-        Info.log(5, f'{len(parsed)} tokens created in {tp:.4f}s.')
+        self.info.log(5, f'{len(parsed)} tokens created in {tp:.4f}s.')
 
         # Save parser token list
         if self.stg.parser_report:
             header = [f'{os.path.split(self.stg.file_load)[1]} parser output\r',
                       f'{len(parsed)} tokens\r\r']
             report_list = [repr(l) + '\r' for l in parsed]
-            report_output(report_list, header, 'parser',
-                          self.stg.file_save, self.stg.print_report)
+            self.report_output(report_list, header, 'parser')
 
         # Generate classic code -----------------------------------------------
-        Info.log(5, 'Generating Classic code.')
+        self.info.log(5, 'Generating Classic code.')
         t0 = time.time()
 
-        c_code, var_r, line_r = par.generate()
+        if streaming:
+            # The lines are generated as the file is saved
+            c_code = par.generate_stream()
+            var_r, line_r = par.des.d_declares, par.line_report
+        else:
+            c_code, var_r, line_r = par.generate()
 
-        tg = time.time() - t0
-        Info.log(5, f'{len(c_code)} lines created in {tg:.4f}s.')
-        Info.log(5, f'Total: {tl+tp+tg:.4f}s.')
+            tg = time.time() - t0
+            self.info.log(5, f'{len(c_code)} lines created in {tg:.4f}s.')
+            self.info.log(5, f'Total: {tl+tp+tg:.4f}s.')
 
         # Relationship between line numbers to use on the monitoring error report
         self.line_list = {}
@@ -2006,8 +3124,7 @@ class Main:
                                            key=lambda kv: (kv[1], kv[0]),
                                            reverse=True)]
             header = [f'{len(report_list)} variables assigned\r\r']
-            report_output(report_list, header, 'variables',
-                          self.stg.file_save, self.stg.print_report)
+            self.report_output(report_list, header, 'variables')
 
         # Save lines report
         if self.stg.line_report:
@@ -2019,23 +3136,97 @@ class Main:
                 report_list.append(f'{line[0]} - {line_classic}\n')
             report_list.pop(0)
             header = [f'{len(report_list)} lines generated.\r(Classic - Dignified)\r\r']
-            report_output(report_list, header, 'lines',
-                          self.stg.file_save, self.stg.print_report)
+            self.report_output(report_list, header, 'lines')
 
         # Save classic code ---------------------------------------------------
-        Info.log(4, f'Saving file: {self.stg.file_save}')
-        IO.save_file(None, c_code, self.stg.file_save)
-
-        # Run tools -----------------------------------------------------------
-        run = Tools.Interface(self.stg)
-        run.run()
+        # Not saved if the tools take it from memory and would delete it
+        if self.stg.save:
+            run = self.ctx.Tools.Interface(self.stg)
+            if streaming or run.keep_ascii():
+                self.info.log(4, f'Saving file: {self.stg.file_save}')
+                IO.save_file(None, c_code, self.stg.file_save)
+                self.ctx.build.wrote(self.stg.file_save)
+            if not streaming:
+                self.ctx.c_code = c_code
+        else:
+            self.ctx.c_code = list(c_code)
+
+        if streaming:
+            tg = time.time() - t0
+            self.info.log(5, f'{par.lines_generated} lines created in {tg:.4f}s.')
+            self.info.log(5, f'Total: {tl+tp+tg:.4f}s.')
+
+        # Run the tokenizer ---------------------------------------------------
+        # The lines generated at once are given in memory, the streamed ones were only saved
+        if self.stg.save:
+            for file_save in run.tokenize(None if streaming else c_code):
+                self.ctx.build.wrote(file_save)
+
+
+# Result of a conversion from convert()
+Result = namedtuple('Result', 'code file_save reports messages error')
+
+
+# Module function -------------------------------------------------------------
+def convert(source, settings=None):
+    '''Convert a Dignified program without leaving the interpreter
+    Each call has its own context so they can follow each other or run on threads
+       source = Path of the file or the code itself (any text with a line break)
+       settings = Command line arguments as a list or a string
+    Return a Result with the classic code lines, the saved file name (None if not saved),
+    the reports by type, the messages and the one that stopped the conversion (None if done)
+    Files are only written when converting a path'''
+
+    if isinstance(settings, str):
+        settings = shlex.split(settings)
+    arguments = list(settings or [])
+
+    source = os.fspath(source)
+    source_text = source if '\n' in source else None
+    file_load = source if source_text is None else 'program.bad'
+
+    # Collect the messages of all modules on this thread
+    messages = []
+    Infolog.capture.output = messages
+
+    # The profiler hook of this thread, to be given back as found
+    profiler = sys.getprofile()
+
+    stg = None
+    ctx = None
+    error = None
+    try:
+        stg = Settings()
+        stg.source_text = source_text
+        stg.save = source_text is None
+        stg.init([file_load] + arguments)
+        ctx = Context(stg)
+        Main(ctx)
+    except SystemExit as e:
+        error = messages[-1] if messages else f'Conversion stopped: {e.code}'
+    finally:
+        Infolog.capture.output = None
+
+        # Leave no profiling or memory tracing behind, even if stopped before Badig did it
+        if stg is not None:
+            stg.stats.close()
+        if sys.getprofile() is not profiler:
+            sys.setprofile(profiler)
+
+    if ctx is None:
+        return Result(None, None, {}, messages, error)
+
+    file_save = stg.file_save if stg.save and error is None else None
+    return Result(ctx.c_code, file_save, ctx.reports, messages, error)
 
 
 # Main function ---------------------------------------------------------------
 def main():
     '''Do the thing'''
 
-    Main()
+    stg = Settings()
+    stg.init()
+    Main(Context(stg))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+'''
+Basic Dignified Benchmark
+Measure the conversion speed of Basic Dignified and its tools
+
+Part of the Basic Dignified Suite
+https://github.com/farique1/basic-dignified
+
+Converts the examples and synthetic programs generated with fixed seeds
+on several sizes for each system, then tokenizes the MSX ones with
+MSX Basic Tokenizer and builds a CAS of the CoCo ones with CoCo to CAS.
+Reports the lines and tokens per second of each phase.
+The results can be saved and compared with the ones of other commits.
+
+badig_benchmark.py [-sz 1k 10k 100k] [-sy msx coco] [-sd #] [-rp #] [-sv file] [-cp file]
+badig_benchmark.py -h for help.
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import namedtuple
+
+LOCAL_PATH = os.path.split(os.path.abspath(__file__))[0]
+ROOT_PATH = os.path.split(LOCAL_PATH)[0]
+sys.path.insert(0, ROOT_PATH)
+
+from msx.msxbatoken import msxbatoken as MSXBatoken
+from coco.cocotocas import Convert as CoCoToCas
+
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000}
+
+EXAMPLES = {'msx': os.path.join(ROOT_PATH, 'examples', 'msx', 'CGK173.dmx'),
+            'coco': os.path.join(ROOT_PATH, 'examples', 'coco', 'EXAMPLE.DCC')}
+
+Program = namedtuple('Program', 'name system file_load args')
+Result = namedtuple('Result', 'program system lines phase seconds tokens')
+
+
+# Synthetic programs ----------------------------------------------------------
+class Corpus:
+    '''Generate Dignified programs with a fixed seed
+    Mixing defines, declares, includes, functions, loop labels,
+    DATA, rem blocks and toggles on both systems
+       system = msx or coco
+       seed = The seed, the same seed and size always give the same program'''
+
+    # Long named variables, the first ones are declared
+    variables = ['playerX', 'playerY', 'scoreTotal', 'livesLeft', 'enemyCount',
+                 'levelNumber', 'bulletX', 'bulletY', 'timerTicks', 'colorIndex',
+                 'speedFactor', 'bonusPoints', 'stageWidth', 'stageHeight']
+    declares = 'declare playerX:px, playerY:py, scoreTotal:sc, livesLeft:lv'
+
+    words = ['READY', 'GAME OVER', 'SCORE', 'LEVEL', 'PRESS SPACE', 'BONUS']
+
+    # Statements of both systems
+    common = ['{v} = {v} + {n}',
+              '{v} += {n}',
+              '{v}++',
+              'if {v} > {n} then {v} = 0 else {v} = {v} - 1',
+              'print "{w}"; {v}',
+              '[clr]',
+              '[?]({n},{n}) "{w}"',
+              'a$ = inkey$ : if a$ = "" then {@}',
+              'data {n},{n},"{w}"',
+              'read {v}',
+              '{v} = .add({v}, {n})',
+              '.show({v})',
+              '#debug print "{w}"',
+              '#release print "{w}"',
+              "' {w}",
+              '## {w}',
+              'print "{w}" _\n        ;{v}',
+              '{v} = [limit] - {v}']
+
+    # Statements of each system
+    systems = {'msx': ['[at]({n},{n}) "{w}"',
+                       'poke &hf3db, {n}',
+                       '{v} = &hff + &b1010 + {n}',
+                       'color 15,1,1',
+                       '_turbo on'],
+               'coco': ['print@{n},"{w}"',
+                        'sound {n},1',
+                        '{v} = &hff + {n}',
+                        'pset({n},{n},1)']}
+
+    extensions = {'msx': '.dmx', 'coco': '.dcc'}
+
+    defines = {'msx': 'define [clr][cls], [at][locate []:print], [limit][255]',
+               'coco': 'define [clr][cls], [limit][255]'}
+
+    def __init__(self, system, seed):
+        self.system = system
+        self.rnd = random.Random(f'{seed}-{system}')
+        self.statements = self.common + self.systems[system]
+        self.labels = 0
+
+    def statement(self):
+        '''Get a random statement'''
+
+        line = self.rnd.choice(self.statements)
+        while '{v}' in line:
+            line = line.replace('{v}', self.rnd.choice(self.variables), 1)
+        while '{n}' in line:
+            line = line.replace('{n}', str(self.rnd.randint(1, 20)), 1)
+
+        return line.replace('{w}', self.rnd.choice(self.words))
+
+    def block(self, indent):
+        '''Get a random block of lines'''
+
+        self.labels += 1
+        kind = self.rnd.randint(0, 10)
+        lines = []
+
+        if kind == 0:
+            lines.append(f'{indent}loop{self.labels}{{')
+            lines.extend(f'{indent}    {self.statement()}' for _ in range(self.rnd.randint(1, 4)))
+            lines.append(f'{indent}    if {self.rnd.choice(self.variables)} > 10 then exit')
+            lines.append(f'{indent}}}')
+
+        elif kind == 1:
+            lines.append(f'{{sub{self.labels}}}')
+            lines.extend(f'    {self.statement()}' for _ in range(self.rnd.randint(1, 4)))
+            lines.append('    return')
+            lines.append(f'{indent}gosub {{sub{self.labels}}}')
+
+        elif kind == 2:
+            lines.append('###')
+            lines.extend(f'    {self.rnd.choice(self.words)}' for _ in range(self.rnd.randint(1, 3)))
+            lines.append('###')
+
+        elif kind == 3:
+            lines.append(f'{indent}for i = 1 to {self.rnd.randint(2, 9)}')
+            lines.extend(f'{indent}    {self.statement()}' for _ in range(self.rnd.randint(1, 3)))
+            lines.append(f'{indent}next i')
+
+        elif kind in (4, 5):
+            lines.append('')
+            lines.append(f'{indent}## {self.rnd.choice(self.words)}')
+
+        else:
+            lines.append(f'{indent}{self.statement()}')
+
+        return lines
+
+    def program(self, size):
+        '''Get a main program of about size lines and its include'''
+
+        main = [f'## Synthetic benchmark program: {self.system} {size} lines',
+                'keep #debug',
+                self.declares,
+                self.defines[self.system],
+                'include "bench_lib.dmx"',
+                '{main}']
+
+        lines = len(main) + 7
+        while lines < size:
+            block = self.block('    ')
+            lines += sum(line.count('\n') + 1 for line in block)
+            main.extend(block)
+
+        main.extend(['    end',
+                     'func .add(a, b)',
+                     '    r = a + b',
+                     'ret r',
+                     'func .show(t)',
+                     '    print t',
+                     'ret'])
+
+        include = ['## Synthetic benchmark library',
+                   'declare libCounter:lc, libValue:lb',
+                   '~keptLongName = libValue',
+                   '{libstart}',
+                   '    libCounter += 1',
+                   '    return']
+
+        return '\n'.join(main) + '\n', '\n'.join(include) + '\n'
+
+    def save(self, size, folder):
+        '''Save the program and its include on a folder
+        Return the main file name'''
+
+        main, include = self.program(size)
+        name = f'bench_{self.system}_{len(main.splitlines())}'
+
+        file_load = os.path.join(folder, name + self.extensions[self.system])
+        with open(file_load, 'w') as f:
+            f.write(main)
+        with open(os.path.join(folder, 'bench_lib.dmx'), 'w') as f:
+            f.write(include)
+
+        return file_load
+
+
+# Runner ----------------------------------------------------------------------
+class Benchmark:
+    '''Run the programs and collect the time of each phase
+       folder = Work folder for the programs and the converted files
+       repeats = Runs of each program, the fastest of each phase is kept
+       badig_args = Extra arguments for Basic Dignified'''
+
+    def __init__(self, folder, repeats, badig_args):
+        self.folder = folder
+        self.repeats = repeats
+        self.badig_args = badig_args
+        self.results = []
+
+    def run(self, program):
+        '''Convert a program and run the tool of its system on the converted code'''
+
+        print(f'--- {program.name}')
+
+        best = {}
+        for _ in range(self.repeats):
+            for result in self.badig(program) + self.tool(program):
+                if result.phase not in best or result.seconds < best[result.phase].seconds:
+                    best[result.phase] = result
+
+        self.results.extend(best.values())
+        for result in best.values():
+            print(self.row(result))
+
+    def badig(self, program):
+        '''Convert a program with Basic Dignified reading its stats report'''
+
+        args = [sys.executable, os.path.join(ROOT_PATH, 'badig.py'), program.file_load,
+                '-id', program.system, '-sts', '-snm', '-vb', '1'] + program.args + self.badig_args
+
+        t0 = time.perf_counter()
+        done = subprocess.run(args, capture_output=True, text=True)
+        total = time.perf_counter() - t0
+
+        if done.returncode or done.stdout.strip() or done.stderr.strip():
+            raise SystemExit(f'*** Conversion failed: {program.file_load}\n{done.stdout}{done.stderr}')
+
+        with open(os.path.splitext(program.file_load)[0] + '_stats.json') as f:
+            stats = json.load(f)
+
+        phases = {p['phase']: p for p in stats['phases']}
+        lines = phases['loader']['lines_out']
+
+        # The phases not going through the code (tools not run) have no lines
+        results = []
+        for phase in stats['phases']:
+            tokens = phase['tokens_in'] or phase['tokens_out']
+            phase_lines = lines if tokens or phase.get('lines_out') else None
+            results.append(Result(program.name, program.system, phase_lines,
+                                  phase['phase'], phase['wall_time'], tokens))
+
+        # Includes the interpreter start and the module loading
+        results.append(Result(program.name, program.system, lines, 'badig total', total, None))
+
+        return results
+
+    def tool(self, program):
+        '''Run the tool of a system on the converted code'''
+
+        base = os.path.splitext(program.file_load)[0]
+
+        if program.system == 'msx':
+            return self.msxbatoken(program, base + '.amx', base + '.bmx')
+
+        return self.cocotocas(program, base + '.ACC')
+
+    def msxbatoken(self, program, file_load, file_save):
+        '''Tokenize with MSX Basic Tokenizer measuring the load, tokenize and save'''
+
+        tok_main = MSXBatoken.Main()
+        tok_main.stg.init()
+        tok_main.stg.file_load = file_load
+        tok_main.stg.file_save = file_save
+        tok_main.stg.list = 0
+        tok_main.stg.verbose = 1
+        MSXBatoken.info.level = 1
+
+        t0 = time.perf_counter()
+        ascii_code = MSXBatoken.io.load_file(file_load)
+        t1 = time.perf_counter()
+        tokenized, _ = MSXBatoken.Tokenize(tok_main.stg).tok(ascii_code)
+        t2 = time.perf_counter()
+        MSXBatoken.io.save_file(tokenized, file_save)
+        t3 = time.perf_counter()
+
+        lines = len(ascii_code)
+        size = os.path.getsize(file_save)
+
+        return [Result(program.name, program.system, lines, 'msxbatoken load', t1 - t0, None),
+                Result(program.name, program.system, lines, 'msxbatoken tokenize', t2 - t1, size),
+                Result(program.name, program.system, lines, 'msxbatoken save', t3 - t2, size)]
+
+    def cocotocas(self, program, file_load):
+        '''Build a CAS with CoCo to CAS'''
+
+        conv = CoCoToCas()
+        conv.file_load = file_load
+        conv.file_format = 'asc'
+
+        with open(file_load, 'rb') as f:
+            lines = len(f.read().splitlines())
+
+        t0 = time.perf_counter()
+        conv.execute()
+        t1 = time.perf_counter()
+
+        size = os.path.getsize(conv.file_save)
+
+        return [Result(program.name, program.system, lines, 'cocotocas', t1 - t0, size)]
+
+    def row(self, result, before=None):
+        '''Format a result as a line of the report
+           before = The same result from a previous run to compare'''
+
+        lines_sec = f'{result.lines / result.seconds:12.0f}' if result.lines and result.seconds else ' ' * 12
+        tokens_sec = f'{result.tokens / result.seconds:12.0f}' if result.tokens and result.seconds else ' ' * 12
+        row = f'  - {result.phase:20} {result.seconds:9.4f}s {lines_sec} lines/s {tokens_sec} tokens/s'
+
+        if before:
+            row += f'  {before.seconds / result.seconds if result.seconds else 0:6.2f}x'
+
+        return row
+
+    def save(self, file_save, seed):
+        '''Save the results as json with the information needed to compare them'''
+
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_PATH,
+                                capture_output=True, text=True).stdout.strip()
+        report = {'commit': commit,
+                  'python': platform.python_version(),
+                  'seed': seed,
+                  'repeats': self.repeats,
+                  'badig_args': self.badig_args,
+                  'results': [r._asdict() for r in self.results]}
+
+        with open(file_save, 'w') as f:
+            f.write(json.dumps(report, indent=4) + '\n')
+
+        print(f'--- Results saved: {file_save}')
+
+    def compare(self, file_compare):
+        '''Show the results against the ones saved from another run'''
+
+        with open(file_compare) as f:
+            report = json.load(f)
+
+        before = {(r['program'], r['phase']): Result(**r) for r in report['results']}
+
+        print(f'--- Compared with {report["commit"] or file_compare} (times faster)')
+        program = None
+        for result in self.results:
+            if result.program != program:
+                program = result.program
+                print(f'--- {program}')
+            print(self.row(result, before.get((result.program, result.phase))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Basic Dignified Benchmark: Measure the conversion speed of '
+                                                 'Basic Dignified and its tools.',
+                                     epilog='Fred Rique (farique) (c) 2018 - '
+                                            'github.com/farique/basic-dignified\n')
+
+    parser.add_argument('-sz', nargs='*', default=list(SIZES), choices=list(SIZES),
+                        help='Sizes of the synthetic programs, none for the examples only (def %(default)s)')
+
+    parser.add_argument('-sy', nargs='+', default=['msx', 'coco'], choices=['msx', 'coco'],
+                        help='Systems to run (def %(default)s)')
+
+    parser.add_argument('-sd', default=1, type=int, metavar='#',
+                        help='Seed of the synthetic programs (def %(default)s)')
+
+    parser.add_argument('-rp', default=1, type=int, metavar='#',
+                        help='Runs of each program keeping the fastest (def %(default)s)')
+
+    parser.add_argument('-ba', default='', metavar='ARGS',
+                        help='Extra arguments for Basic Dignified, as -ba="-stm -ca"')
+
+    parser.add_argument('-wd', default='', metavar='FOLDER',
+                        help='Work folder, keeps the programs and the converted files (def a temporary one)')
+
+    parser.add_argument('-sv', default='', metavar='FILE',
+                        help='Save the results as json to compare later')
+
+    parser.add_argument('-cp', default='', metavar='FILE',
+                        help='Compare the results with a json saved before')
+
+    args = parser.parse_args()
+
+    folder = args.wd or tempfile.mkdtemp(prefix='badig_benchmark_')
+    os.makedirs(folder, exist_ok=True)
+
+    # The examples and the programs of each size for each system
+    # Synthetic programs start at 1 with step 1 to fit the larger sizes
+    programs = []
+    for system in args.sy:
+        example = os.path.join(folder, os.path.basename(EXAMPLES[system]))
+        with open(EXAMPLES[system], encoding='latin1') as f:
+            code = f.read()
+        # The remtags would run the tools and the emulators
+        with open(example, 'w', encoding='latin1') as f:
+            f.write(code.replace('##BB:', '## BB:'))
+        programs.append(Program(os.path.basename(example), system, example, []))
+
+        for size in args.sz:
+            file_load = Corpus(system, args.sd).save(SIZES[size], folder)
+            programs.append(Program(f'{system} {size}', system, file_load, ['-ls', '1', '-lp', '1']))
+
+    bench = Benchmark(folder, max(args.rp, 1), args.ba.split())
+    try:
+        for program in programs:
+            bench.run(program)
+    finally:
+        if not args.wd:
+            shutil.rmtree(folder)
+
+    if args.sv:
+        bench.save(args.sv, args.sd)
+
+    if args.cp:
+        bench.compare(args.cp)
+
+
+if __name__ == '__main__':
+    main()
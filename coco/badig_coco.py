@@ -5,6 +5,7 @@ import configparser
 from collections import namedtuple
 
 from support.helper import Infolog
+from support.badig_variables import ShortVariables
 
 infolog = Infolog()
 
@@ -111,10 +112,6 @@ class Description:
         self.c_print_alt = '?'
 
         # Variables
-        # Hard coded short variable names
-        self.c_hard_short_vars = set()
-        # Kept long named variables
-        self.c_hard_long_vars = set()
         # Short names without type
         self.c_varsna = r'^[a-zA-z][a-zA-Z0-9]?$'
         # Variable character letters. First and second chars
@@ -150,7 +147,8 @@ class Description:
         self.c_func_stop_kw = c_instrc + c_jumpin + c_funcdl + c_funcnm
 
         # Hack so the regex match partially until it get to the correct match
-        c_partls = [r'&(h|o)?']
+        # Only used by the legacy lexer, the automaton does not need it
+        self.c_partls = [r'&(h|o)?']
 
         # Additional tokens
         # (These token are not used for match, they are entered directly on the code
@@ -180,7 +178,6 @@ class Description:
         clc_oper = fr"(?P<c_operat>{self.join_commands(c_operat)})"
         clc_jump = fr"(?P<c_jumpin>{self.join_commands(c_jumpin)})"
         clc_inst = fr"(?P<c_instrc>{self.join_commands(c_instrc)})"
-        clc_part = fr"(?P<c_partls>{self.join_commands(c_partls)})"
         clc_lrem = fr'(?P<c_linrem>{c_linrem})'
         clc_data = fr'(?P<c_dataln>{c_dataln})'
         clc_brem = fr'(?P<c_o_brem>{c_o_brem})'
@@ -200,7 +197,6 @@ class Description:
                                rf'{clc_lrem}|'
                                rf'{clc_data}|'
                                rf'{clc_brem}|'
-                               rf'{clc_part}|'
                                rf'{clc_insp}|'
                                rf'{clc_litr}')
 
@@ -423,7 +419,7 @@ class Parser:
         self.des = par.des
         self.stg = stg
         self.Tok = Tok
-        self.var_index = self.des.c_var_max
+        self.short_vars = ShortVariables(self.des)
 
     # Initialization ----------------------------------------------------------
     def initialization(self):
@@ -447,6 +443,7 @@ class Parser:
         '''Get a list of hardcoded short variables'''
 
         vc = self.des.c_var_valid_chars
+        conflicts = self.des.conflicts
 
         g = re.match(self.des.c_idnttp_grp, tk.lval)
         variable = g.group(1)
@@ -462,7 +459,7 @@ class Parser:
                 Info.log(1, f'Long variable already declared: '
                             f'{variable}:{self.des.d_declares[variable]}', tk)
 
-            for var in self.des.c_hard_long_vars:
+            for var in conflicts.long_colliding(variable):
                 if variable != var.var_name \
                         and (var.var_name.startswith(variable)
                              or variable.startswith(var.var_name)):
@@ -471,7 +468,7 @@ class Parser:
 
             # Remove the ~ and update long hard vars list
             self.par.tok_list_out.pop()
-            self.des.c_hard_long_vars.update({tk})
+            conflicts.add_long(tk)
 
             return
 
@@ -480,21 +477,20 @@ class Parser:
 
             return
 
-        for var in self.des.c_hard_short_vars:
-            if len(variable) > vc and variable[:vc] == var:
-                Info.log(2, f'Reserved short variable conflict: '
-                            f'{variable} {var}', tk)
+        if len(variable) > vc and variable[:vc] in self.des.c_hard_short_vars:
+            Info.log(2, f'Reserved short variable conflict: '
+                        f'{variable} {variable[:vc]}', tk)
 
-        for var in self.des.c_hard_long_vars:
+        for var in conflicts.long_colliding(variable):
             if (variable != var.var_name) \
                     and ((variable == var.var_name[:vc])
-                         or (variable in [lng_var.var_name for lng_var in self.des.c_hard_long_vars]
+                         or (conflicts.is_long(variable)
                              and var.var_name.startswith(variable))):
                 Info.log(2, f'Reserved long variable conflict: '
                             f'{variable} {var.var_name}', tk)
 
         if len(variable) <= vc:
-            self.des.c_hard_short_vars.update({variable})
+            conflicts.add_short(variable)
 
         return
 
@@ -513,9 +509,8 @@ class Parser:
             return tk
 
         # Leave if variable already kept as long named
-        for var in self.des.c_hard_long_vars:
-            if variable == var.var_name and tk.pos.file == var.pos.file:
-                return tk
+        if self.short_vars.is_kept(variable, tk.pos.file):
+            return tk
 
         variable += tk.pos.file
         # Return declared short named variable
@@ -526,24 +521,12 @@ class Parser:
             return tk
 
         # Create new short variable
-        # Get xx format by decomposing 676 in two base 26 digits (a-z)
-        short_var = '--'
-        while self.var_index > 0:
-            self.var_index -= 1
-
-            idx_h = int(self.var_index / self.des.c_var_mod)
-            idx_l = round(self.var_index % self.des.c_var_mod)
-
-            short_var = self.des.c_var_chr[idx_h] + self.des.c_var_chr[idx_l]
+        short_var = self.short_vars.allocate()
+        if short_var is not None:
+            self.des.d_declares[variable] = short_var
+            tk.val = short_var + var_type
 
-            if short_var not in self.des.d_declares.items() \
-                    and short_var not in self.des.c_hard_short_vars \
-                    and short_var not in [var.var_name[:vc] for var in self.des.c_hard_long_vars]:
-
-                self.des.d_declares[variable] = short_var
-                tk.val = short_var + var_type
-
-                return tk
+            return tk
 
         Info.log(1, f'Too many variables used (max={self.des.c_var_max}): '
                     f'{self.par.tk.val}', self.par.tk)
@@ -551,8 +534,7 @@ class Parser:
     def trans_char(self, text):
         '''Convert unicode characters into ASCII equivalents'''
 
-        translation = text.maketrans(self.des.c_original, self.des.c_translat)
-        text = text.translate(translation)
+        text = text.translate(self.des.c_translation)
 
         return text
 
@@ -718,12 +700,12 @@ class Parser:
 
         # Separate X from OR to avoid XOR
         if self.par.token.uval == 'OR' \
-                and self.par.c_line[-1].upper() == 'X':
-            self.par.c_line += ' '
+                and self.par.c_last.upper() == 'X':
+            self.par.emit(' ')
 
         # Separate hex numbers from text begining with 'acbdef'
         elif self.par.token.uval[0] in 'ABCDEF' \
                 and self.par.line[self.par.n - 1].tok == 'C_NUMBER':
-            self.par.c_line += ' '
+            self.par.emit(' ')
 
         return False
@@ -13,6 +13,9 @@ cocotocas.py -h
 """
 
 import os
+import re
+import pstats
+import cProfile
 import binascii
 import argparse
 from argparse import RawDescriptionHelpFormatter
@@ -23,6 +26,7 @@ class Convert:
         self.file_load = ''
         self.file_save = ''
         self.file_format = ''
+        self.profile = 0
 
     def arguments(self):
         parser = argparse.ArgumentParser(description='Convert CoCo programs to .cas format.\n'
@@ -34,11 +38,33 @@ class Convert:
         parser.add_argument("input", nargs='?', default=self.file_load, help='File to convert')
         parser.add_argument("output", nargs='?', default=self.file_save, help='.cas file to export')
         parser.add_argument("-ff", default=self.file_format, choices=['bas', 'bin', 'asc'], type=str.lower, help="Override type: bas, bin, asc")
+        parser.add_argument("-pf", default=self.profile, const=20, type=int, nargs='?', metavar='#',
+                            help="Profile showing the [#] slowest functions (20 if no #), also ##BB:profile=# on the program")
         args = parser.parse_args()
 
         self.file_load = args.input
         self.file_save = args.output
         self.file_format = args.ff
+        self.profile = abs(args.pf)
+
+        # A ##BB:profile= remtag on the program overrides the argument
+        try:
+            with open(self.file_load, 'rb') as f:
+                remtag = re.search(rb'##BB:profile=(\d+)', f.read(), re.I)
+            self.profile = int(remtag.group(1)) if remtag else self.profile
+        except OSError:
+            pass
+
+    def profiled(self, phase, function):
+        # Run a phase profiling it, save the calls as .pstats and the slowest functions as .txt
+        profile = cProfile.Profile()
+        profile.runcall(function)
+
+        file_profile = os.path.splitext(self.file_save)[0] + '_profile'
+        profile.dump_stats(file_profile + '.pstats')
+        with open(file_profile + '.txt', 'w') as f:
+            f.write(f'--- {phase}\n')
+            pstats.Stats(profile, stream=f).sort_stats('tottime').print_stats(self.profile)
 
     def bytes_from_file(self, filename, chunksize=8192):
         with open(filename, "rb") as f:
@@ -143,7 +169,10 @@ class Convert:
 def main():
     conv = Convert()
     conv.arguments()
-    conv.execute()
+    if conv.profile:
+        conv.profiled('convert', conv.execute)
+    else:
+        conv.execute()
 
 
 if __name__ == '__main__':
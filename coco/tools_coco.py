@@ -11,14 +11,41 @@ class Interface:
         self.stg = e_stg
 
     def run(self):
+        self.tokenize()
+        self.emulate()
+
+    def keep_ascii(self):
+        '''Tell if the ASCII code must be saved, decb always reads it from the file'''
+
+        return True
+
+    def tokenize(self, code=None):
+        '''Tokenize the code if asked, return the files saved
+           code = Lines of the ASCII code, not used as decb reads the saved file'''
+
+        stats = self.stg.stats
+
+        stats.start('tokenizer')
         runt = ti.Run(self.stg)
         runt.run()
+        stats.stop()
 
+        files = []
         if runt.stg.tokenize and os.path.isfile(runt.stg.file_bin):
             self.stg.file_save = runt.stg.file_bin
+            files.append(runt.stg.file_bin)
+
+        return files
+
+    def emulate(self):
+        '''Open the code on the emulator if asked'''
+
+        stats = self.stg.stats
 
+        stats.start('emulator')
         rune = ei.Run(self.stg)
         rune.run()
+        stats.stop()
 
 
 class Expose:
@@ -5,6 +5,7 @@ import configparser
 from collections import namedtuple
 
 from support.helper import Infolog
+from support.badig_variables import ShortVariables
 
 infolog = Infolog()
 
@@ -130,10 +131,6 @@ class Description:
         self.c_print_alt = '?'
 
         # Variables
-        # Hard coded short variable names
-        self.c_hard_short_vars = set()
-        # Kept long named variables
-        self.c_hard_long_vars = set()
         # Short names without type
         self.c_varsna = r'^[a-zA-z][a-zA-Z0-9]?$'
         # Variable character letters. First and second chars
@@ -169,7 +166,8 @@ class Description:
         self.c_func_stop_kw = c_instrc + c_jumpin + c_funcdl + c_funcnm
 
         # Hack so the regex match partially until it get to the correct match
-        c_partls = [r'&(h|o|b)?']
+        # Only used by the legacy lexer, the automaton does not need it
+        self.c_partls = [r'&(h|o|b)?']
 
         # Additional tokens
         # (These token are not used for match, they are entered directly on the code
@@ -199,7 +197,6 @@ class Description:
         clc_oper = fr"(?P<c_operat>{self.join_commands(c_operat)})"
         clc_jump = fr"(?P<c_jumpin>{self.join_commands(c_jumpin)})"
         clc_inst = fr"(?P<c_instrc>{self.join_commands(c_instrc)})"
-        clc_part = fr"(?P<c_partls>{self.join_commands(c_partls)})"
         clc_lrem = fr'(?P<c_linrem>{c_linrem})'
         clc_data = fr'(?P<c_dataln>{c_dataln})'
         clc_brem = fr'(?P<c_o_brem>{c_o_brem})'
@@ -219,7 +216,6 @@ class Description:
                                rf'{clc_lrem}|'
                                rf'{clc_data}|'
                                rf'{clc_brem}|'
-                               rf'{clc_part}|'
                                rf'{clc_insp}|'
                                rf'{clc_litr}')
 
@@ -442,7 +438,7 @@ class Parser:
         self.des = par.des
         self.stg = stg
         self.Tok = Tok
-        self.var_index = self.des.c_var_max
+        self.short_vars = ShortVariables(self.des)
 
     # Initialization ----------------------------------------------------------
     def initialization(self):
@@ -464,6 +460,7 @@ class Parser:
         '''Get a list of hardcoded short variables'''
 
         vc = self.des.c_var_valid_chars
+        conflicts = self.des.conflicts
 
         # If variable preceded by ~
         if self.par.last_tok().val == self.des.d_keepid:
@@ -477,7 +474,7 @@ class Parser:
                             f'{tk.lval} '
                             f'{tk.var_name}:{self.des.d_declares[tk.val_w_file]}', tk)
 
-            for var in self.des.c_hard_long_vars:
+            for var in conflicts.long_colliding(tk.var_name):
                 if tk.var_name != var.var_name \
                         and (var.var_name.startswith(tk.var_name)
                              or tk.var_name.startswith(var.var_name)):
@@ -486,7 +483,7 @@ class Parser:
 
             # Remove the ~ and update long hard vars list
             self.par.tok_list_out.pop()
-            self.des.c_hard_long_vars.update({tk})
+            conflicts.add_long(tk)
 
             return
 
@@ -495,21 +492,20 @@ class Parser:
 
             return
 
-        for var in self.des.c_hard_short_vars:
-            if len(tk.var_name) > vc and tk.var_name[:vc] == var:
-                Info.log(2, f'Reserved short variable conflict: '
-                            f'{tk.var_name} {var}', tk)
+        if len(tk.var_name) > vc and tk.var_name[:vc] in self.des.c_hard_short_vars:
+            Info.log(2, f'Reserved short variable conflict: '
+                        f'{tk.var_name} {tk.var_name[:vc]}', tk)
 
-        for var in self.des.c_hard_long_vars:
+        for var in conflicts.long_colliding(tk.var_name):
             if (tk.var_name != var.var_name) \
                     and ((tk.var_name == var.var_name[:vc])
-                         or (tk.var_name in [lng_var.var_name for lng_var in self.des.c_hard_long_vars]
+                         or (conflicts.is_long(tk.var_name)
                              and var.var_name.startswith(tk.var_name))):
                 Info.log(2, f'Reserved long variable conflict: '
                             f'{tk.var_name} {var.var_name}', tk)
 
         if len(tk.var_name) <= vc:
-            self.des.c_hard_short_vars.update({tk.var_name})
+            conflicts.add_short(tk.var_name)
 
         return
 
@@ -524,9 +520,8 @@ class Parser:
             return tk
 
         # Leave if variable already kept as long named
-        for var in self.des.c_hard_long_vars:
-            if tk.var_name == var.var_name and tk.pos.file == var.pos.file:
-                return tk
+        if self.short_vars.is_kept(tk.var_name, tk.pos.file):
+            return tk
 
         # Return declared short named variable
         if tk.val_w_file in self.des.d_declares:
@@ -536,23 +531,12 @@ class Parser:
             return tk
 
         # Create new short variable
-        # Get xx format by decomposing 676 in two base 26 digits (a-z)
-        while self.var_index > 0:
-            self.var_index -= 1
-
-            idx_h = int(self.var_index / self.des.c_var_mod)
-            idx_l = round(self.var_index % self.des.c_var_mod)
-
-            short_var = self.des.c_var_chr[idx_h] + self.des.c_var_chr[idx_l]
+        short_var = self.short_vars.allocate()
+        if short_var is not None:
+            self.des.d_declares[tk.val_w_file] = short_var
+            tk.val = short_var + tk.var_type
 
-            if short_var not in self.des.d_declares.items() \
-                    and short_var not in self.des.c_hard_short_vars \
-                    and short_var not in [var.var_name[:vc] for var in self.des.c_hard_long_vars]:
-
-                self.des.d_declares[tk.val_w_file] = short_var
-                tk.val = short_var + tk.var_type
-
-                return tk
+            return tk
 
         Info.log(1, f'Too many variables used (max={self.des.c_var_max}): '
                     f'{self.par.tk.val}', self.par.tk)
@@ -560,9 +544,7 @@ class Parser:
     def trans_char(self, text):
         '''Convert unicode characters into ASCII equivalents'''
 
-        text = ''.join([self.des.c_replacements.get(c, c) for c in text])
-        translation = text.maketrans(self.des.c_original, self.des.c_translat)
-        text = text.translate(translation)
+        text = text.translate(self.des.c_translation)
 
         return text
 
@@ -687,12 +669,12 @@ class Parser:
 
         # Separate X from OR to avoid XOR
         if self.par.token.uval == 'OR' \
-                and self.par.c_line[-1].upper() == 'X':
-            self.par.c_line += ' '
+                and self.par.c_last.upper() == 'X':
+            self.par.emit(' ')
 
         # Separate hex numbers from text begining with 'acbdef'
         elif self.par.token.uval[0] in 'ABCDEF' \
                 and self.par.line[self.par.n - 1].tok == 'C_NUMBER':
-            self.par.c_line += ' '
+            self.par.emit(' ')
 
         return False
@@ -26,7 +26,9 @@ TODO (and ideas):
 '''
 
 import re
+import pstats
 import os.path
+import cProfile
 import argparse
 
 # Keyword lists
@@ -66,6 +68,7 @@ unravel_if = ''        # Break IF/THEN/ELSE lines: f=colons, t=bef THEN, n=aft T
 unravel_for = 'f'
 unravel_colons = 'c'  # Break lines at ':': i=with indent, w=without indent, c=colon on line below
 verbose_level = 3      # Show processing status: 0-silent 1-+errors 2-+warnings 3-+steps 4-+details
+profile = 0            # Profile the phases showing the [#] slowest functions of each (0 no), also ##BB:profile=#
 # Put a space before and/or after a keyword if preceded/followed by this matches
 repelcbef = r'[a-z0-9{}")$]'
 repelcaft = r'[a-z0-9{}"(]'
@@ -158,6 +161,11 @@ parser.add_argument('-vb', default=verbose_level, type=int,
                     '2=1+warnings, 3=2+steps(def), 4=3+details. '
                     f'def {verbose_level}')
 
+parser.add_argument('-pf', default=profile, const=20, type=int, nargs='?', metavar='#',
+                    help='Profile the phases showing the [#] slowest functions of each '
+                    '(20 if no #) (0 no), also ##BB:profile=#. '
+                    f'def {profile}')
+
 args = parser.parse_args()
 
 # Apply chosen settings
@@ -184,6 +192,15 @@ spacesbef = args.sb
 spacesaft = args.sa
 forcetogt = args.ft
 verbose_level = args.vb
+profile = abs(args.pf)
+
+# A ##BB:profile= remtag on the source overrides the argument
+try:
+    with open(file_load, 'rb') as f:
+        remtag = re.search(rb'##BB:profile=(\d+)', f.read(), re.I)
+    profile = int(remtag.group(1)) if remtag else profile
+except OSError:
+    pass
 
 keywords = instr + funct + branc
 keywords.sort(key=len, reverse=True)
@@ -643,11 +660,40 @@ def dignify(classic_code):
     return assemble_dignified(dignified_dict, labels, rem_lines)
 
 
+def run_phase(profiles, phase, function, *args):
+    '''Run a function as a phase, profiling it if asked
+    '''
+    if not profile:
+        return function(*args)
+
+    return profiles.setdefault(phase, cProfile.Profile()).runcall(function, *args)
+
+
+def save_profile(profiles, file_save):
+    '''Save the calls of all phases as .pstats and the slowest functions of each as .txt
+    '''
+    if not profiles:
+        return
+
+    show_log('', 'Profile saving', 3)
+    file_profile = os.path.splitext(file_save)[0] + '_profile'
+    pstats.Stats(*profiles.values()).dump_stats(file_profile + '.pstats')
+    try:
+        with open(file_profile + '.txt', 'w') as f:
+            for phase, prof in profiles.items():
+                f.write(f'--- {phase}\n')
+                pstats.Stats(prof, stream=f).sort_stats('tottime').print_stats(profile)
+    except IOError as e:
+        show_log('', str(e), 1)  # Exit
+
+
 def main():
 
-    classic_code = load_file(file_load)
-    dignified_code = dignify(classic_code)
-    save_file(dignified_code, file_save)
+    profiles = {}
+    classic_code = run_phase(profiles, 'load', load_file, file_load)
+    dignified_code = run_phase(profiles, 'dignify', dignify, classic_code)
+    run_phase(profiles, 'save', save_file, dignified_code, file_save)
+    save_profile(profiles, file_save)
 
 
 if __name__ == '__main__':
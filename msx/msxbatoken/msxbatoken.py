@@ -29,6 +29,7 @@ Notes:
         Syntax errors generates wildly different results from the ones generated by the MSX.
     Conversion stopping errors:
         Line number too high, Line number out of order, Lines not starting with numbers, Branching lines too high
+        Program too big to fit the Basic memory (32767 bytes from 0x8001)
         Numbers bigger than their explicit type (in some cases they are converted up as per on the MSX)
     Tested with over 100 random basic programs from magazines and other sources, some crated to stress the conversions
         However there should be still some (several?) fringe cases not covered here. Be careful.
@@ -36,8 +37,13 @@ Notes:
 
 import re
 import time
+import struct
+import pickle
+import pstats
+import hashlib
 import os.path
-import binascii
+import cProfile
+import tempfile
 import argparse
 import configparser
 
@@ -77,8 +83,33 @@ TOKENS = [('>', 'ee'), ('PAINT', 'bf'), ('=', 'ef'), ('ERROR', 'a6'), ('ERR', 'e
 
           ("'", '3a8fe6'), ('ELSE', '3aa1'), ('AS', '4153')]
 
+
+def index_tokens(tokens):
+    '''Group the tokens by their first character keeping their order,
+    the first one starting the source is the one used
+       tokens = List of (command, token), the tokens are given back as bytes'''
+
+    index = {}
+    for command, token in tokens:
+        index.setdefault(command[0], []).append((command, bytes.fromhex(token)))
+
+    return index
+
+
+TOKENS_INDEX = index_tokens(TOKENS)
+
 JUMPS = ['RESTORE', 'AUTO', 'RENUM', 'DELETE', 'RESUME', 'ERL', 'ELSE', 'RUN', 'LIST', 'LLIST', 'GOTO', 'RETURN', 'THEN', 'GOSUB']
 
+# Patterns matched on the line source while tokenizing
+FILE_NUMBER = re.compile(r'(\s*)(\d{1,2})')
+JUMP_LINE = re.compile(r'(\s*)(\d+|,+)')
+NUMBER = re.compile(r'(\d*)\s*(.)\s*(.?)')
+FLOAT = re.compile(r'(\d*)\s*(.)\s*(\d*)\s*(.)\s*(.?)')
+EXPONENT = re.compile(r'\d*\s*.\s*\d*\s*.\s*(\+|-)\s*(\d+)')
+HEX_DIGITS = re.compile(r'[0-9a-fA-F]*')
+OCT_DIGITS = re.compile(r'[0-7]*')
+BIN_DIGITS = re.compile(r'[01]*')
+
 
 class Info():
     # Logger module ---------------------------------------------------------------
@@ -95,6 +126,7 @@ class Info():
 
     def __init__(self):
         self.level = 5
+        self.output = print  # Shows a message, a parent module can take them instead
         self.position = '({lin},{col}): '
         self.message = '{bullet}{file}{pos}{desc}'
         self.bullets = ['',      # 0 none
@@ -134,7 +166,7 @@ class Info():
             if error or show_file:
                 file = f'{os.path.basename(data["file"])}: '
 
-        print(self.message.format(bullet=bullet, file=file, pos=pos, desc=desc))
+        self.output(self.message.format(bullet=bullet, file=file, pos=pos, desc=desc))
 
         if error:
             raise SystemExit(0)
@@ -142,24 +174,36 @@ class Info():
 
 class IO():
     # Load file -------------------------------------------------------------------
-    def load_file(self, file_load, encoding='latin1'):
+    def load_file(self, file_load, encoding='latin1', code=None):
         '''Load the ASCII code.
            file_load = Name of the file
-           encoding = File encoding format'''
+           encoding = File encoding format
+           code = Lines of the ASCII code already in memory, file_load only names them'''
 
-        ascii_code = []
-        if file_load:
+        lines = []
+        if code is not None:
+            text = ''.join(code)
+            try:
+                text.encode(encoding)
+            except UnicodeEncodeError as e:
+                info.log(1, f'Encode error: {str(e)}')
+            lines = re.split(r'\r\n|\r|\n', text)
+        elif file_load:
             try:
                 with open(file_load, 'r', encoding=encoding) as f:
-                    for line in f:
-                        if line.strip() == "" or line.strip().isdigit():
-                            continue
-                        ascii_code.append(line.strip() + '\r\n')
+                    lines = f.readlines()
             except IOError:
                 info.log(1, f'File not found: {file_load}')
         else:
             info.log(1, 'File name not given.')
 
+        ascii_code = []
+        for line in lines:
+            line = line.strip()
+            if line == "" or line.isdigit():
+                continue
+            ascii_code.append(line + '\r\n')
+
         return ascii_code
 
     # Save file -------------------------------------------------------------------
@@ -170,8 +214,7 @@ class IO():
 
         try:
             with open(file_save, 'wb') as f:
-                for line in tokenized_code:
-                    f.write(binascii.unhexlify(line))
+                f.write(tokenized_code)
         except IOError:
             info.log(1, f'Save folder not found: {file_save}')
 
@@ -185,7 +228,7 @@ class IO():
 
         list_code.extend(list_data.core)
 
-        list_code.append(str(list_data.hexa) + ': 0000' + (' ' * (stg.width_line + 6)) + 'end')
+        list_code.append('{0:04x}'.format(list_data.adrs) + ': 0000' + (' ' * (stg.width_line + 6)) + 'end')
 
         list_code.extend(["", "' -------------------------------------",
                               "' Statistics",
@@ -223,9 +266,12 @@ class Settings:
         # Variables
         self.file_load = ''             # Source file
         self.file_save = ''              # Destination file
+        self.code = None                 # Lines of the ASCII code given in memory instead of read from file_load
         self.list = 16                    # Save a .mlt list file detailing the tokenization: [#] number of bytes per line (def 16) (max 32) (0 no)
         self.del_ascii = False           # Delete the original ASCII file
         self.verbose = 3                 # Verbosity level: 0 silent, 1 errors, 2 +warnings, 3 +steps(def), 4 +details, 5 +conversion dump
+        self.profile = 0                 # Profile the phases showing the [#] slowest functions of each (20 if no #) (0 no), also ##BB:profile=#
+        self.line_cache = True           # Keep the tokenized lines to only tokenize the changed ones next time
 
     def init(self):
         '''Initialize the settings module'''
@@ -262,6 +308,8 @@ class Settings:
                 self.list = int(configs_sec.get('list') or self.list)
                 self.del_ascii = configs_sec.getboolean('del_ascii') if configs_sec.get('del_ascii') != '' else self.del_ascii
                 self.verbose = int(configs_sec.get('verbose') or self.verbose)
+                self.profile = int(configs_sec.get('profile') or self.profile)
+                self.line_cache = configs_sec.getboolean('line_cache') if configs_sec.get('line_cache', '') != '' else self.line_cache
             except (ValueError, configparser.NoOptionError) as e:
                 info.log(1, f'Problem with:{self.BATOKEN_INI}:{str(e)}')
 
@@ -273,7 +321,9 @@ class Settings:
                              'file_save': '',
                              'list': str(self.list),
                              'del_ascii': str(self.del_ascii),
-                             'verbose': str(self.verbose)}
+                             'verbose': str(self.verbose),
+                             'profile': str(self.profile),
+                             'line_cache': str(self.line_cache)}
 
         with open(self.BATOKEN_INI, 'w') as configfile:
             config.write(configfile)
@@ -308,6 +358,15 @@ class Settings:
                             help='Verbosity level: 0 silent, 1 errors, 2 +warnings, '
                             '3 +steps, 4 +details, 5 +conversion dump (def %(default)s)')
 
+        parser.add_argument('-pf',
+                            default=self.profile, const=20, type=int, nargs='?', metavar='#',
+                            help='Profile the phases showing the [#] slowest functions of each '
+                            '(20 if no #) (0 no), also ##BB:profile=# (def %(default)s)')
+
+        parser.add_argument('-nc',
+                            default=self.line_cache, action='store_false',
+                            help='Do not use the cache of tokenized lines')
+
         parser.add_argument('-ini',
                             action='store_true',
                             help='Create msxbatoken.ini (def %(default)s)')
@@ -340,34 +399,79 @@ class Settings:
 
         self.verbose = args.vb
 
+        self.profile = abs(args.pf)
+
+        self.line_cache = args.nc
+
         self.write_ini_file = args.ini
 
+    def profile_remtag(self, profile):
+        '''Get the amount of functions to profile from a ##BB:profile= remtag on the source
+        Only read from the file, the code given in memory is profiled by who gave it'''
+
+        if self.code is not None:
+            return profile
+
+        try:
+            with open(self.file_load, 'rb') as f:
+                remtag = re.search(rb'##BB:profile=(\d+)', f.read(), re.I)
+        except OSError:
+            return profile
+
+        return int(remtag.group(1)) if remtag else profile
+
 
 class Tokenize:
     '''Tokenize'''
 
-    def __init__(self, stg):
+    def __init__(self, stg, cache=None):
         self.source = 0
-        self.compiled = ''
-        self.line_compiled = ''
+        self.compiled = b''
+        self.line_compiled = bytearray()
         self.line_source = ''
+        self.column = 0
         self.stg = stg
+        self.cache = cache
 
     def update_lines(self):
-        if len(self.line_source) > 2:
-            self.line_source = self.line_source[self.source:]
-            self.line_compiled = self.line_compiled + self.compiled
+        '''Move the column over the source of the last token and keep it compiled'''
+
+        if self.remaining() > 2:
+            self.column += self.source
+            self.line_compiled += self.compiled
             self.show_steps()
 
+    def remaining(self):
+        '''Length of the line source still to tokenize'''
+
+        return len(self.line_source) - self.column
+
+    def match(self, pattern, offset=0):
+        '''Match a compiled regex on the line source from the column
+           offset = Characters after the column to start the match'''
+
+        return pattern.match(self.line_source, self.column + offset)
+
+    def find_token(self):
+        '''Get the first (command, token) of TOKENS starting the line source or None
+        Only the commands starting with its first character are tried'''
+
+        column = self.column
+        for command, token in TOKENS_INDEX.get(self.line_source[column:column + 1].upper(), ()):
+            if self.line_source[column:column + len(command)].upper() == command:
+                return command, token
+
+        return None
+
     def parse_numeric_bases(self, log_data, line_number, nugget_comp, token, base):
         if not nugget_comp:
             nugget_comp = ''
-            hexa = '0000'
+            number = 0
         else:
-            if int(nugget_comp, base) > 65535:
+            number = int(nugget_comp, base)
+            if number > 65535:
                 info.log(1, f'Number overflow: {nugget_comp}', log_data)
-            hexa = '{0:04x}'.format(int(nugget_comp, base))
-        return token + hexa[2:] + hexa[:-2]
+        return token + struct.pack('<H', number)
 
     def parse_sgn_dbl(self, header, precision, nugget_integer, nugget_fractional, nugget_group_1_orig, nugget_number):
         nugget_stripped = nugget_integer.lstrip('0')
@@ -393,14 +497,16 @@ class Tokenize:
         return hexa, nugget_integer
 
     def show_steps(self):
-        info.log(5, f'{self.line_compiled} | {self.line_source.rstrip()}')
+        if info.level >= 5:
+            info.log(5, f'{self.line_compiled.hex()} | {self.line_source[self.column:].rstrip()}')
 
-    def make_list_line(self, base_prev, line_base):
+    def make_list_line(self, base_prev, line_base, line_bytes):
         line_inc = 12
         line_temp = []
-        next_addr = str(self.line_compiled[0:4])
-        curr_line = str(self.line_compiled[4:8])
-        line_byte = str(self.line_compiled[8:])
+        line_compiled = line_bytes.hex()
+        next_addr = str(line_compiled[0:4])
+        curr_line = str(line_compiled[4:8])
+        line_byte = str(line_compiled[8:])
         line_splt = [line_byte[i:i + self.stg.width_byte] for i in range(0, len(line_byte), self.stg.width_byte)]
         for line in line_splt:
             curr_addr = str(hex(base_prev)[2:][:-2]) + str(hex(base_prev)[2:][2:])
@@ -417,19 +523,45 @@ class Tokenize:
 
         return line_temp
 
+    def link(self, lines):
+        '''Join the tokenized lines, each one starting with the address of the next
+           lines = List of (line source, tokenized line)'''
+
+        line_address = BASE
+        list_core = []
+        tokenized_code = bytearray(b'\xff')
+
+        for line_base, line_compiled in lines:
+            base_prev = line_address
+            line_address += len(line_compiled) + 3
+            line_start = len(tokenized_code)
+            tokenized_code += struct.pack('<H', line_address)
+            tokenized_code += line_compiled
+            tokenized_code.append(0)
+
+            if self.stg.list:
+                list_core.extend(self.make_list_line(base_prev, line_base, tokenized_code[line_start:]))
+
+        tokenized_code += b'\x00\x00'
+
+        return tokenized_code, list_core, line_address
+
     def tok(self, ascii_code):
         line_address = BASE
         line_order = 0
         line_number = 0
-        list_core = []
-        tokenized_code = ['ff']
+        lines = []
         log_data = {}
 
+        # The lines tokenized before are taken from the cache, the steps can only be shown tokenizing
+        cache = self.cache if self.cache and info.level < 5 else None
+
         for n, self.line_source in enumerate(ascii_code, 1):
             log_data = {'lin': n, 'text': self.line_source, 'col': 1, 'file': self.stg.file_load}
 
             line_base = self.line_source
-            self.line_compiled = ''
+            self.line_compiled = bytearray()
+            self.column = 0
 
             if self.line_source == '':
                 continue
@@ -450,82 +582,80 @@ class Tokenize:
             if int(line_number) > 65529:
                 info.log(1, f'Line number too high: {line_number}', log_data)
             line_order = int(line_number)
-            self.line_source = self.line_source[len(nugget):]
-            hexa = '{0:04x}'.format(int(nugget))
-            self.line_compiled += hexa[2:] + hexa[:-2]
+            self.column = len(nugget)
+            self.line_compiled += struct.pack('<H', line_order)
 
             self.show_steps()
 
-            # Look for instructions
-            while len(self.line_source) > 2:
-                log_data['col'] = len(self.line_source)
-                for command, token in TOKENS:
-                    if self.line_source.upper().startswith(command):
-                        self.compiled = token
-                        self.source = len(command)
-                        self.update_lines()
+            # A cached line has nothing left to look at
+            cached = cache.get(line_base) if cache else None
+            if cached is not None:
+                self.line_compiled = cached
+                self.column = len(self.line_source)
 
-                        if command == 'AS':
-                            nugget = re.match(r'(\s*)(\d{1,2})', self.line_source)
+            # Look for instructions
+            while self.remaining() > 2:
+                log_data['col'] = self.remaining()
+                keyword = self.find_token()
+                if keyword:
+                    command, token = keyword
+                    self.compiled = token
+                    self.source = len(command)
+                    self.update_lines()
+
+                    if command == 'AS':
+                        nugget = self.match(FILE_NUMBER)
+                        if nugget:
+                            nugget_spaces = nugget.group(1)
+                            nugget_line = nugget.group(2)
+                            self.compiled = b' ' * len(nugget_spaces) + bytes([ord(nugget_line)])
+                            self.source = len(nugget_spaces) + len(nugget_line)
+                            self.update_lines()
+
+                    # Is a jumping instructions
+                    if command in JUMPS:
+                        while True:
+                            nugget = self.match(JUMP_LINE)
                             if nugget:
                                 nugget_spaces = nugget.group(1)
                                 nugget_line = nugget.group(2)
-                                hex_spaces = '20' * len(nugget_spaces)
-                                hexa = '{0:02x}'.format(ord(nugget_line))
-                                self.compiled = hex_spaces + hexa
-                                self.source = len(nugget_spaces) + len(nugget_line)
-                                self.update_lines()
-
-                        # Is a jumping instructions
-                        if command in JUMPS:
-                            while True:
-                                nugget = re.match(r'(\s*)(\d+|,+)', self.line_source)
-                                if nugget:
-                                    nugget_spaces = nugget.group(1)
-                                    nugget_line = nugget.group(2)
-                                    if nugget_line.isdigit():
-                                        if int(nugget_line) > 65529:
-                                            info.log(1, f'Line number jump too high: {nugget_line}', log_data)
-                                        hex_spaces = '20' * len(nugget_spaces)
-                                        hexa = '{0:04x}'.format(int(nugget_line))
-                                        self.compiled = hex_spaces + '0e' + hexa[2:] + hexa[:-2]
-                                        self.source = len(nugget_spaces) + len(nugget_line)
-                                        self.update_lines()
-                                    # Has several jumps (on goto/gosub)
-                                    else:
-                                        hex_spaces = '20' * len(nugget_spaces)
-                                        hexa = '2c' * len(nugget_line)
-                                        self.compiled = hex_spaces + hexa
-                                        self.source = len(nugget_spaces) + len(nugget_line)
-                                        self.update_lines()
+                                if nugget_line.isdigit():
+                                    if int(nugget_line) > 65529:
+                                        info.log(1, f'Line number jump too high: {nugget_line}', log_data)
+                                    self.compiled = b' ' * len(nugget_spaces) + b'\x0e' + struct.pack('<H', int(nugget_line))
+                                    self.source = len(nugget_spaces) + len(nugget_line)
+                                    self.update_lines()
+                                # Has several jumps (on goto/gosub)
                                 else:
-                                    break
-
-                        # Instruction with literal data after it
-                        if command == 'DATA' or command == 'REM' or command == "'" or command == 'CALL' or command == '_':
-                            while True:
-                                character = self.line_source[0]
-                                if command == 'CALL' or command == '_':
-                                    character = character.upper()
-                                hexa = '{0:02x}'.format(ord(character))
-                                self.compiled = hexa
-                                self.source = 1
-                                self.update_lines()
-
-                                if len(self.line_source) <= 2 \
-                                        or (command == 'DATA' and self.line_source[0] == ':') \
-                                        or (command == '_' and (self.line_source[0] == ':' or self.line_source[0] == '('))\
-                                        or (command == 'CALL' and (self.line_source[0] == ':' or self.line_source[0] == '(')):
-                                    break
-                        break
+                                    self.compiled = b' ' * len(nugget_spaces) + b',' * len(nugget_line)
+                                    self.source = len(nugget_spaces) + len(nugget_line)
+                                    self.update_lines()
+                            else:
+                                break
+
+                    # Instruction with literal data after it
+                    if command == 'DATA' or command == 'REM' or command == "'" or command == 'CALL' or command == '_':
+                        while True:
+                            character = self.line_source[self.column]
+                            if command == 'CALL' or command == '_':
+                                character = character.upper()
+                            self.compiled = bytes([ord(character)])
+                            self.source = 1
+                            self.update_lines()
+
+                            if self.remaining() <= 2 \
+                                    or (command == 'DATA' and self.line_source[self.column] == ':') \
+                                    or (command == '_' and (self.line_source[self.column] == ':' or self.line_source[self.column] == '('))\
+                                    or (command == 'CALL' and (self.line_source[self.column] == ':' or self.line_source[self.column] == '(')):
+                                break
 
                 # Look each character
                 else:
                     # Is a number
                     is_int = False
-                    nugget = self.line_source[0].upper()
+                    nugget = self.line_source[self.column].upper()
                     if nugget.isdigit() or nugget == '.':
-                        nugget = re.match(r'(\d*)\s*(.)\s*(.?)', self.line_source)
+                        nugget = self.match(NUMBER)
                         nugget_number = nugget.group(1)
                         nugget_integer = nugget.group(1)
                         nugget_fractional = ''
@@ -534,7 +664,7 @@ class Tokenize:
 
                         # Is floating point
                         if nugget_signal == '.':
-                            nugget = re.match(r'(\d*)\s*(.)\s*(\d*)\s*(.)\s*(.?)', self.line_source)
+                            nugget = self.match(FLOAT)
                             nugget_group1 = '0' if nugget.group(1) == '' else nugget.group(1)
                             nugget_number = nugget_group1 + nugget.group(3)
                             nugget_integer = nugget_group1
@@ -558,7 +688,7 @@ class Tokenize:
                         # Is scientific notation
                         if (nugget_signal.lower() == 'e' or nugget_signal.lower() == 'd') \
                                 and (nugget_notif_confirm == '-' or nugget_notif_confirm == '+'):  # Avoid matching E from ELSE after a number
-                            exp = re.match(r'\d*\s*.\s*\d*\s*.\s*(\+|-)\s*(\d+)', self.line_source)
+                            exp = self.match(EXPONENT)
 
                             nugget_exp_size = len(nugget_integer.lstrip('0')) + int(exp.group(1) + exp.group(2))
                             nugget_man_size = nugget_exp_size - len(nugget_fractional[1:]) - len(nugget_integer.lstrip('0'))
@@ -578,11 +708,12 @@ class Tokenize:
                                 hexa, _ = self.parse_sgn_dbl('1d', 6, notation_integer, notation_fractional,
                                                              nugget.group(1), notation_number)
                                 hexa += '0' * (10 - len(hexa))
+                                number = bytes.fromhex(hexa)
                             else:
                                 hexa, _ = self.parse_sgn_dbl('1f', 14, notation_integer, notation_fractional,
                                                              nugget.group(1), notation_number)
                                 hexa += '0' * (18 - len(hexa))
-                                hexa = hexa[0:18]
+                                number = bytes.fromhex(hexa[0:18])
 
                             nugget_integer = nugget.group(1) if nugget_integer.lstrip('0') == '' else nugget_integer
                             nugget_signal += exp.group(1) + exp.group(2)
@@ -595,6 +726,7 @@ class Tokenize:
                             hexa, nugget_integer = self.parse_sgn_dbl('1d', 6, nugget_integer, nugget_fractional,
                                                                       nugget.group(1), nugget_number)
                             hexa += '0' * (10 - len(hexa))
+                            number = bytes.fromhex(hexa)
 
                         # Is double precision
                         elif (int(nugget_number) >= 1000000 and int(nugget_number) <= (10 ** 63 - 1)) \
@@ -604,104 +736,200 @@ class Tokenize:
                             hexa, nugget_integer = self.parse_sgn_dbl('1f', 14, nugget_integer, nugget_fractional,
                                                                       nugget.group(1), nugget_number)
                             hexa += '0' * (18 - len(hexa))
-                            hexa = hexa[0:18]
+                            number = bytes.fromhex(hexa[0:18])
 
                         # Is normal integer
                         elif int(nugget_number) >= 0 and int(nugget_number) <= 9:
-                            nugget_add = str(int(nugget_number) + 17)
-                            hexa = '{0:02x}'.format(int(nugget_add))
+                            number = bytes([int(nugget_number) + 17])
 
                         elif int(nugget_number) >= 10 and int(nugget_number) <= 255:
-                            hexa = '0f' + '{0:02x}'.format(int(nugget_number))
+                            number = b'\x0f' + bytes([int(nugget_number)])
 
                         elif int(nugget_number) >= 256 and int(nugget_number) <= 32767:
-                            hexa = '{0:04x}'.format(int(nugget_number))
-                            hexa = '1c' + hexa[2:] + hexa[:-2]
+                            number = b'\x1c' + struct.pack('<H', int(nugget_number))
 
                         else:
                             info.log(1, f'Number too high: {nugget_number.lstrip("0")}', log_data)
 
-                        self.compiled = hexa
+                        self.compiled = number
                         self.source = len(nugget_integer) + len(nugget_fractional) + len(nugget_signal)
                         self.update_lines()
 
                     # Other bases
                     elif nugget == '&':
-                        nugget = self.line_source[0:2].upper()
+                        nugget = self.line_source[self.column:self.column + 2].upper()
                         if nugget == '&H':
-                            nugget_comp = re.match(r'[0-9a-f]*', self.line_source[2:].lower()).group()
-                            hexa = self.parse_numeric_bases(log_data, line_number, nugget_comp, '0c', 16)
+                            nugget_comp = self.match(HEX_DIGITS, 2).group().lower()
+                            number = self.parse_numeric_bases(log_data, line_number, nugget_comp, b'\x0c', 16)
                         elif nugget == '&O':
-                            nugget_comp = re.match(r'[0-7]*', self.line_source[2:]).group()
-                            hexa = self.parse_numeric_bases(log_data, line_number, nugget_comp, '0b', 8)
+                            nugget_comp = self.match(OCT_DIGITS, 2).group()
+                            number = self.parse_numeric_bases(log_data, line_number, nugget_comp, b'\x0b', 8)
                         elif nugget == '&B':
-                            nugget_comp = re.match(r'[01]*', self.line_source[2:]).group()
-                            hexa = '2642'
-                            if nugget_comp:
-                                for character in nugget_comp:
-                                    hexa += '{0:02x}'.format(ord(character))
-                            else:
-                                nugget_comp = ''
+                            nugget_comp = self.match(BIN_DIGITS, 2).group()
+                            number = b'&B' + nugget_comp.encode('latin1')
                         else:
                             nugget = '&'
-                            hexa = '{0:02x}'.format(ord(nugget))
+                            number = b'&'
                             nugget_comp = ''
-                        self.compiled = hexa
+                        self.compiled = number
                         self.source = len(nugget) + len(nugget_comp)
                         self.update_lines()
 
                     # Quotes
                     else:
-                        nugget = self.line_source[0].upper()
+                        nugget = self.line_source[self.column].upper()
                         if nugget == '"':
                             num_quotes = 0
                             while True:
-                                if self.line_source[0] == '"':
+                                if self.line_source[self.column] == '"':
                                     num_quotes += 1
-                                hexa = '{0:02x}'.format(ord(self.line_source[0]))
-                                self.compiled = hexa
+                                self.compiled = bytes([ord(self.line_source[self.column])])
                                 self.source = 1
                                 self.update_lines()
-                                if num_quotes > 1 or len(self.line_source) <= 2:
+                                if num_quotes > 1 or self.remaining() <= 2:
                                     break
                         # And the rest
                         else:
                             if ord(nugget) >= 65 and ord(nugget) <= 90:
                                 is_var = True
                                 while True:
-                                    nugget = self.line_source[0].upper()
-                                    for command, token in TOKENS:
-                                        if self.line_source.upper().startswith(command):
-                                            is_var = False
+                                    nugget = self.line_source[self.column].upper()
+                                    if self.find_token():
+                                        is_var = False
                                     if (ord(nugget) < 48 or ord(nugget) > 57) \
                                             and (ord(nugget) < 65 or ord(nugget) > 90) \
                                             or not is_var:
                                         is_var = False
                                         break
-                                    hexa = '{0:02x}'.format(ord(nugget.upper()))
-                                    self.compiled = hexa
+                                    self.compiled = bytes([ord(nugget.upper())])
                                     self.source = 1
                                     self.update_lines()
                             else:
-                                self.compiled = '{0:02x}'.format(ord(nugget.upper()))
+                                self.compiled = bytes([ord(nugget.upper())])
                                 self.source = 1
                                 self.update_lines()
 
-            base_prev = line_address
-            line_address += (len(self.line_compiled) + 6) // 2
-            hexa = '{0:04x}'.format(line_address)
-            self.line_compiled = hexa[2:] + hexa[:-2] + self.line_compiled
-            self.line_compiled += '00'
-            tokenized_code.append(self.line_compiled)
+            # The addresses are only added up here, the lines are linked when all are done
+            line_address += len(self.line_compiled) + 3
+            if line_address > 65535:
+                info.log(1, f'Program too big: {line_address - BASE} bytes', dict(log_data, col=1))
+            lines.append((line_base, bytes(self.line_compiled)))
+            if self.cache:
+                self.cache.keep(line_base, lines[-1][1])
 
-            if self.stg.list:
-                list_core.extend(self.make_list_line(base_prev, line_base))
+        tokenized_code, list_core, line_address = self.link(lines)
+
+        list_data = namedtuple('list_data', 'core adrs line')
+
+        return tokenized_code, list_data(list_core, line_address, len(ascii_code))
 
-        tokenized_code.append('0000')
 
-        list_data = namedtuple('list_data', 'core hexa adrs line')
+class LineCache:
+    '''Keep the tokenized lines of a file by their source
+    so the next tokenization of the file only tokenizes the changed ones
+    Only the lines of the last tokenization are kept, all are dropped if the tokenizer changes
+       file_save = The tokenized file
+       enabled = Use the cache, False neither loads nor saves the lines'''
+
+    def __init__(self, file_save, enabled=True):
+        self.enabled = enabled
+        self.lines = {}
+        self.used = {}
+        self.hits = 0
+
+        local_path = os.path.split(os.path.abspath(__file__))[0]
+        name = hashlib.sha256(os.path.abspath(file_save).encode('utf-8')).hexdigest()
+        self.file_cache = os.path.join(local_path, 'cache', name + '.lines')
+
+        try:
+            with open(__file__, 'rb') as f:
+                self.key = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            self.enabled = False
+
+    def load(self):
+        '''Get the lines of the last tokenization, nothing if missing or outdated'''
+
+        if not self.enabled:
+            return
+
+        try:
+            with open(self.file_cache, 'rb') as f:
+                key, lines = pickle.load(f)
+        except (OSError, EOFError, ValueError, TypeError,
+                AttributeError, ImportError, pickle.UnpicklingError):
+            return
+
+        if key == self.key:
+            self.lines = lines
 
-        return tokenized_code, list_data(list_core, hexa, line_address, len(ascii_code))
+    def get(self, line_source):
+        '''Get the tokenized line of a source or None if not kept'''
+
+        line_compiled = self.lines.get(line_source)
+        if line_compiled is not None:
+            self.hits += 1
+
+        return line_compiled
+
+    def keep(self, line_source, line_compiled):
+        '''Keep a tokenized line to be saved'''
+
+        self.used[line_source] = line_compiled
+
+    def save(self):
+        '''Store the lines of this tokenization
+        Failing to write only means they will be tokenized again next time'''
+
+        if not self.enabled:
+            return
+
+        folder = os.path.dirname(self.file_cache)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            handle, temp = tempfile.mkstemp(dir=folder)
+            with os.fdopen(handle, 'wb') as f:
+                pickle.dump((self.key, self.used), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self.file_cache)
+        except OSError:
+            pass
+
+
+class Profile:
+    '''Profile the phases of the tokenization with cProfile
+       amount = Slowest functions shown for each phase, 0 does not profile'''
+
+    def __init__(self, amount):
+        self.amount = amount
+        self.profiles = {}
+
+    def run(self, phase, function, *args):
+        '''Run a function as part of a phase'''
+
+        if not self.amount:
+            return function(*args)
+
+        profile = self.profiles.setdefault(phase, cProfile.Profile())
+        return profile.runcall(function, *args)
+
+    def save(self, file_save):
+        '''Save the calls of all phases as .pstats and the slowest functions of each as .txt
+           file_save = The tokenized file, the profile is saved besides it'''
+
+        if not self.profiles:
+            return
+
+        file_profile = os.path.splitext(file_save)[0] + '_profile'
+        info.log(4, f'Saving profile: {file_profile}.pstats')
+        pstats.Stats(*self.profiles.values()).dump_stats(file_profile + '.pstats')
+
+        try:
+            with open(file_profile + '.txt', 'w') as f:
+                for phase, profile in self.profiles.items():
+                    f.write(f'--- {phase}\n')
+                    pstats.Stats(profile, stream=f).sort_stats('tottime').print_stats(self.amount)
+        except IOError:
+            info.log(1, f'Save folder not found: {file_profile}.txt')
 
 
 class Main:
@@ -713,22 +941,33 @@ class Main:
         info.log(3, f'MSX Basic Tokenizer')
         info.log(3, f'Tokenizing: {os.path.basename(self.stg.file_load)}')
 
+        prof = Profile(self.stg.profile)
+
         # Load ASCII code ---------------------------------------------------------
-        info.log(4, f'Loading file: {self.stg.file_load}')
-        ascii_code = io.load_file(self.stg.file_load)
+        if self.stg.code is None:
+            info.log(4, f'Loading file: {self.stg.file_load}')
+        ascii_code = prof.run('load', io.load_file, self.stg.file_load, 'latin1', self.stg.code)
 
         # Tokenize it -------------------------------------------------------------
-        tok = Tokenize(self.stg)
-        tokenized, list_data = tok.tok(ascii_code)
+        cache = LineCache(self.stg.file_save, self.stg.line_cache)
+        prof.run('load', cache.load)
+        tok = Tokenize(self.stg, cache)
+        tokenized, list_data = prof.run('tokenize', tok.tok, ascii_code)
+        if cache.enabled:
+            info.log(4, f'Lines from cache: {cache.hits} of {len(cache.used)}')
 
         # Save tokenized code -----------------------------------------------------
         info.log(4, f'Saving file: {self.stg.file_save}')
-        io.save_file(tokenized, self.stg.file_save)
+        prof.run('save', io.save_file, tokenized, self.stg.file_save)
+        prof.run('save', cache.save)
 
         # Save list ---------------------------------------------------------------
         if self.stg.list > 0:
             info.log(4, f'Saving list: {self.stg.file_list}')
-            io.save_list(self.stg, list_data)
+            prof.run('save', io.save_list, self.stg, list_data)
+
+        # Save profile ------------------------------------------------------------
+        prof.save(self.stg.file_save)
 
         # Delete ASCII code -------------------------------------------------------
         if self.stg.del_ascii:
@@ -746,6 +985,7 @@ def main():
 
     tok_main = Main()
     tok_main.stg.init()
+    tok_main.stg.profile = tok_main.stg.profile_remtag(tok_main.stg.profile)
     info.level = tok_main.stg.verbose
     tok_main.execute()
 
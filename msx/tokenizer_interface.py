@@ -18,14 +18,23 @@ except ModuleNotFoundError as e:
 class Run:
     def __init__(self, e_stg):
         self.e_stg = e_stg
+        self.stg = None
 
-    def run(self):
-        self.stg = Settings(self.e_stg)
-        self.stg.init()
+    def settings(self):
+        '''Initialize the settings once, they can be asked before running'''
+
+        if self.stg is None:
+            self.stg = Settings(self.e_stg)
+            self.stg.init()
+
+        return self.stg
+
+    def run(self, code=None):
+        self.settings()
 
         if self.stg.tokenize:
             tok = Tokenizer(self.stg)
-            tok.run()
+            tok.run(code)
 
 
 class Expose():
@@ -136,7 +145,9 @@ class Tokenizer:
     def __init__(self, stg):
         self.stg = stg
 
-    def run(self):
+    def run(self, code=None):
+        '''Tokenize the ASCII code
+           code = Lines of the ASCII code, None reads them from the saved file'''
 
         tok = MSXBatoken
 
@@ -145,6 +156,7 @@ class Tokenizer:
         tok_main.stg.init()
 
         tok_main.stg.file_load = self.stg.file_save
+        tok_main.stg.code = code
         tok_main.stg.file_save = os.path.splitext(self.stg.file_save)[0] + self.stg.binary_ext
         tok_main.stg.file_list = os.path.splitext(self.stg.file_save)[0] + self.stg.list_ext
 
@@ -153,11 +165,19 @@ class Tokenizer:
         tok_main.stg.width_byte = bytes_width * 2
         tok_main.stg.width_line = bytes_width * 3 + 7
 
-        tok_main.stg.del_ascii = self.stg.del_ascii
+        # The ASCII code given in memory to be deleted is not saved
+        tok_main.stg.del_ascii = self.stg.del_ascii and code is None
 
         tok_main.stg.verbose = self.stg.verbose
         tok.info.level = self.stg.verbose
 
+        # The tokenizer messages go with the Badig ones, to be collected or kept with the build
+        tok.info.output = lambda message: Infolog.emit([message])
+
+        # Profiled by Badig as its tokenizer phase
+        tok_main.stg.profile = 0
+
         tok_main.execute()
 
         self.stg.file_bin = tok_main.stg.file_save
+        self.stg.file_list = tok_main.stg.file_list
@@ -9,16 +9,49 @@ class Interface:
 
     def __init__(self, e_stg):
         self.stg = e_stg
+        self.runt = ti.Run(e_stg)
 
     def run(self):
-        runt = ti.Run(self.stg)
-        runt.run()
+        self.tokenize()
+        self.emulate()
 
+    def keep_ascii(self):
+        '''Tell if the ASCII code must be saved
+        It is not when it is tokenized from memory and deleted after'''
+
+        stg = self.runt.settings()
+
+        return not (stg.tokenize and stg.del_ascii)
+
+    def tokenize(self, code=None):
+        '''Tokenize the code if asked, return the files saved
+           code = Lines of the ASCII code, None reads them from the saved file'''
+
+        stats = self.stg.stats
+        runt = self.runt
+
+        stats.start('tokenizer')
+        runt.run(code)
+        stats.stop()
+
+        files = []
         if runt.stg.tokenize and os.path.isfile(runt.stg.file_bin):
             self.stg.file_save = runt.stg.file_bin
+            files.append(runt.stg.file_bin)
+            if runt.stg.list > 0 and os.path.isfile(runt.stg.file_list):
+                files.append(runt.stg.file_list)
+
+        return files
+
+    def emulate(self):
+        '''Open the code on the emulator if asked'''
+
+        stats = self.stg.stats
 
+        stats.start('emulator')
         rune = ei.Run(self.stg)
         rune.run()
+        stats.stop()
 
 
 class Expose:
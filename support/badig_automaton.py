@@ -0,0 +1,462 @@
+import re
+import threading
+
+# Moves found while scanning change the shared tables, one thread at a time
+moving = threading.Lock()
+
+
+# Automaton -------------------------------------------------------------------
+class Automaton:
+    '''Table driven automaton for the token groups of a language description
+    Built from the same regex the descriptions assemble with join_commands
+    so any module declaring its word lists gets it without extra work
+       pattern = Alternation of named groups anchored with ^ and $
+       flags = Regex flags applied to the characters (re.I)
+
+    States are created as the characters are met and kept for the next tokens
+    or all at once for an alphabet with fill() so the tables can be stored
+    A state is a set of positions of the expression on the way to a match'''
+
+    DEAD = -1
+
+    def __init__(self, pattern, flags=0):
+        self.flags = flags
+
+        # Expression positions
+        self.kind = []
+        self.arg = []
+        self.edges = []
+
+        # Character classes
+        self.char_src = []
+        self.char_re = []
+
+        # Group name of each top level alternative
+        self.names = []
+
+        self.start = self.build(pattern)
+
+        # Deterministic states
+        self.state_ids = {}
+        self.state_sets = []
+        self.groups = []
+        self.moves = []
+
+        # Characters with all their moves known
+        # the ones missing from the moves lead nowhere
+        self.filled = frozenset()
+        self.members = []
+        self.unfilled = []
+
+        self.add_state(self.closure([self.start], initial=True))
+
+    def __getstate__(self):
+        '''Leave the compiled classes and the parsing leftovers out of the cache'''
+
+        state = self.__dict__.copy()
+        state['char_re'] = [None] * len(self.char_src)
+        state.pop('src', None)
+        state.pop('idx', None)
+
+        return state
+
+    # Regex parsing -----------------------------------------------------------
+    def parse(self, pattern):
+        '''Parse the regex into a tree
+        Only the subset used by the descriptions is supported:
+        literals, escapes, classes, groups, alternation,
+        ?, *, +, {m,n} and the ^ and $ anchors'''
+
+        self.src = pattern
+        self.idx = 0
+        tree = self.parse_alt()
+
+        if self.idx < len(pattern):
+            raise ValueError(f'Unbalanced parenthesis at {self.idx}: {pattern}')
+
+        return tree
+
+    def parse_alt(self):
+        '''Parse alternatives separated by |'''
+
+        alts = [self.parse_cat()]
+        while self.peek() == '|':
+            self.idx += 1
+            alts.append(self.parse_cat())
+
+        return ('alt', alts) if len(alts) > 1 else alts[0]
+
+    def parse_cat(self):
+        '''Parse a sequence of quantified atoms'''
+
+        items = []
+        while self.peek() not in ('', '|', ')'):
+            items.append(self.parse_repeat(self.parse_atom()))
+
+        return ('cat', items)
+
+    def parse_repeat(self, atom):
+        '''Parse the quantifiers following an atom'''
+
+        while True:
+            c = self.peek()
+            if c == '*':
+                atom = ('rep', atom, 0, None)
+            elif c == '+':
+                atom = ('rep', atom, 1, None)
+            elif c == '?':
+                atom = ('rep', atom, 0, 1)
+            elif c == '{':
+                g = re.match(r'\{(\d*)(,(\d*))?\}', self.src[self.idx:])
+                if not g or not (g.group(1) or g.group(3)):
+                    return atom
+                low = int(g.group(1) or 0)
+                high = low if not g.group(2) else (int(g.group(3)) if g.group(3) else None)
+                atom = ('rep', atom, low, high)
+                self.idx += len(g.group()) - 1
+            else:
+                return atom
+
+            self.idx += 1
+
+            # Lazy quantifiers match the same strings
+            if self.peek() == '?':
+                self.idx += 1
+
+    def parse_atom(self):
+        '''Parse a single atom'''
+
+        c = self.peek()
+        self.idx += 1
+
+        if c == '(':
+            name = None
+            if self.src.startswith('?P<', self.idx):
+                close = self.src.index('>', self.idx)
+                name = self.src[self.idx + 3:close]
+                self.idx = close + 1
+            elif self.src.startswith('?:', self.idx):
+                self.idx += 2
+            elif self.peek() == '?':
+                raise ValueError(f'Group type not supported at {self.idx}: {self.src}')
+
+            tree = self.parse_alt()
+            if self.peek() != ')':
+                raise ValueError(f'Missing ) at {self.idx}: {self.src}')
+            self.idx += 1
+
+            return ('group', name, tree)
+
+        elif c == '^':
+            return ('bol',)
+
+        elif c == '$':
+            return ('eol',)
+
+        elif c == '[':
+            end = self.idx
+            if self.src[end:end + 1] == '^':
+                end += 1
+            if self.src[end:end + 1] == ']':
+                end += 1
+            while self.src[end] != ']':
+                end += 2 if self.src[end] == '\\' else 1
+            src = self.src[self.idx - 1:end + 1]
+            self.idx = end + 1
+
+            return ('char', src)
+
+        elif c == '\\':
+            e = self.peek()
+            self.idx += 1
+            if e in 'AZ':
+                return ('bol',) if e == 'A' else ('eol',)
+            if e in 'bB' or e.isdigit():
+                raise ValueError(f'Escape not supported: \\{e}: {self.src}')
+
+            return ('char', '\\' + e)
+
+        return ('char', '.' if c == '.' else re.escape(c))
+
+    def peek(self):
+        '''Get the current character of the regex being parsed'''
+
+        return self.src[self.idx:self.idx + 1]
+
+    # Expression positions ----------------------------------------------------
+    def node(self, kind, arg=None):
+        '''Create an expression position'''
+
+        self.kind.append(kind)
+        self.arg.append(arg)
+        self.edges.append([])
+
+        return len(self.kind) - 1
+
+    def char_class(self, src):
+        '''Get the index of a character class'''
+
+        if src not in self.char_src:
+            self.char_src.append(src)
+            self.char_re.append(None)
+
+        return self.char_src.index(src)
+
+    def char_match(self, cls, char):
+        '''Tell if a character belongs to a class, compiling it when first used'''
+
+        if self.char_re[cls] is None:
+            self.char_re[cls] = re.compile(self.char_src[cls], self.flags)
+
+        return bool(self.char_re[cls].fullmatch(char))
+
+    def fragment(self, tree):
+        '''Turn a tree into connected positions
+        Return the first and the last position of the fragment'''
+
+        kind = tree[0]
+
+        if kind == 'char':
+            first = self.node('char', self.char_class(tree[1]))
+        elif kind in ('bol', 'eol'):
+            first = self.node(kind)
+        else:
+            first = self.node('eps')
+        last = self.node('eps')
+
+        if kind in ('char', 'bol', 'eol'):
+            self.edges[first].append(last)
+
+        elif kind == 'group':
+            start, end = self.fragment(tree[2])
+            self.edges[first].append(start)
+            self.edges[end].append(last)
+
+        elif kind == 'cat':
+            prev = first
+            for item in tree[1]:
+                start, end = self.fragment(item)
+                self.edges[prev].append(start)
+                prev = end
+            self.edges[prev].append(last)
+
+        elif kind == 'alt':
+            for item in tree[1]:
+                start, end = self.fragment(item)
+                self.edges[first].append(start)
+                self.edges[end].append(last)
+
+        elif kind == 'rep':
+            item, low, high = tree[1:]
+            prev = first
+            for _ in range(low):
+                start, end = self.fragment(item)
+                self.edges[prev].append(start)
+                prev = end
+            if high is None:
+                start, end = self.fragment(item)
+                self.edges[prev].append(start)
+                self.edges[end].append(start)
+                self.edges[end].append(last)
+            else:
+                for _ in range(high - low):
+                    start, end = self.fragment(item)
+                    self.edges[prev].append(start)
+                    self.edges[prev].append(last)
+                    prev = end
+            self.edges[prev].append(last)
+
+        return first, last
+
+    def build(self, pattern):
+        '''Build the positions of all alternatives
+        Each top level alternative ends on an accepting position
+        that tells the group name, the first alternative has the priority'''
+
+        tree = self.parse(pattern)
+        alts = tree[1] if tree[0] == 'alt' else [tree]
+
+        start = self.node('eps')
+        for alt in alts:
+            first, last = self.fragment(alt)
+            self.edges[start].append(first)
+            accept = self.node('accept', len(self.names))
+            self.edges[last].append(accept)
+            self.names.append(self.group_name(alt))
+
+        return start
+
+    def group_name(self, tree):
+        '''Find the outermost named group of an alternative'''
+
+        if tree[0] == 'group' and tree[1]:
+            return tree[1]
+
+        children = []
+        if tree[0] in ('cat', 'alt'):
+            children = tree[1]
+        elif tree[0] in ('group', 'rep'):
+            children = [tree[-1] if tree[0] == 'group' else tree[1]]
+
+        for child in children:
+            name = self.group_name(child)
+            if name:
+                return name
+
+    # Deterministic states ----------------------------------------------------
+    def closure(self, positions, initial=False, final=False):
+        '''Get the positions reachable without reading characters
+           initial = At the start of the token, ^ can be crossed
+           final = At the end of the token, $ can be crossed'''
+
+        seen = set()
+        stack = list(positions)
+        while stack:
+            p = stack.pop()
+            if p in seen:
+                continue
+            seen.add(p)
+            kind = self.kind[p]
+            if kind == 'eps' \
+                    or (kind == 'bol' and initial) \
+                    or (kind == 'eol' and final):
+                stack.extend(self.edges[p])
+
+        return frozenset(seen)
+
+    def add_state(self, positions):
+        '''Register a state and find the group it accepts if any'''
+
+        self.state_ids[positions] = len(self.state_sets)
+        self.state_sets.append(positions)
+        self.moves.append({})
+
+        accepts = [self.arg[p] for p in self.closure(positions, final=True)
+                   if self.kind[p] == 'accept']
+        self.groups.append(self.names[min(accepts)] if accepts else None)
+
+        if self.filled:
+            self.unfilled.append(len(self.state_sets) - 1)
+
+        return self.state_ids[positions]
+
+    def move(self, state, char):
+        '''Find the state reached from a state by reading a character'''
+
+        with moving:
+            target = self.moves[state].get(char)
+            if target is None:
+                target = self.find_move(state, char)
+
+        return target
+
+    def find_move(self, state, char):
+        '''Create the move of a state with a character'''
+
+        matched = {}
+        positions = []
+        for p in self.state_sets[state]:
+            if self.kind[p] != 'char':
+                continue
+            cls = self.arg[p]
+            if cls not in matched:
+                matched[cls] = self.char_match(cls, char)
+            if matched[cls]:
+                positions.extend(self.edges[p])
+
+        target = self.DEAD
+        if positions:
+            target = self.target(positions)
+
+        self.moves[state][char] = target
+        self.complete()
+
+        return target
+
+    def target(self, positions):
+        '''Get the state of the positions reached by a move, creating it if new'''
+
+        positions = self.closure(positions)
+        target = self.state_ids.get(positions)
+        if target is None:
+            target = self.add_state(positions)
+
+        return target
+
+    def fill(self, alphabet):
+        '''Create all the states and moves reachable with an alphabet
+        Only the moves going somewhere are kept'''
+
+        self.filled = frozenset(alphabet) | self.filled
+        self.members = [[char for char in self.filled if self.char_match(cls, char)]
+                        for cls in range(len(self.char_src))]
+        self.unfilled = list(range(len(self.state_sets)))
+        self.complete()
+
+    def complete(self):
+        '''Find the moves with the filled alphabet of the states still missing them'''
+
+        while self.unfilled:
+            state = self.unfilled.pop()
+
+            reached = {}
+            for p in self.state_sets[state]:
+                if self.kind[p] == 'char':
+                    for char in self.members[self.arg[p]]:
+                        reached.setdefault(char, []).extend(self.edges[p])
+
+            moves = self.moves[state]
+            for char in list(moves):
+                if char in self.filled and moves[char] == self.DEAD:
+                    del moves[char]
+            for char, positions in reached.items():
+                moves[char] = self.target(positions)
+
+    # Use ---------------------------------------------------------------------
+    def scan(self, text, start):
+        '''Find the token starting at a position of a text
+        Characters are taken while the token can still be completed
+        and, after the first complete token, while it stays complete
+        Return the group and the end position of the token
+        The group is None if the characters never make a complete token
+        and the end is the start if the first character is not recognized'''
+
+        moves = self.moves
+        groups = self.groups
+        state = 0
+        group = None
+        end = start
+        length = len(text)
+
+        while end < length:
+            char = text[end]
+            target = moves[state].get(char)
+            if target is None:
+                if char in self.filled:
+                    break
+                target = self.move(state, char)
+            if target == self.DEAD:
+                break
+            if groups[target] is None and group is not None:
+                break
+            state = target
+            group = groups[target]
+            end += 1
+
+        return group, end
+
+    def match(self, text):
+        '''Get the group of a whole text or None if it is not a token'''
+
+        state = 0
+        for char in text:
+            target = self.moves[state].get(char)
+            if target is None:
+                if char in self.filled:
+                    return None
+                target = self.move(state, char)
+            if target == self.DEAD:
+                return None
+            state = target
+
+        return self.groups[state]
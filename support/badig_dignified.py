@@ -25,8 +25,6 @@ class Description:
         # General identifiers snake separator
         self.d_idsnake = '_'
 
-        # Defines dictionary
-        self.d_defines = {}
         # Defines delimiter open
         self.d_defdop = '['
         # Defines delimiter close
@@ -37,9 +35,11 @@ class Description:
         self.d_defvop = '('
         # Defines variable delimiter close
         self.d_defvcl = ')'
+        # Defines nested on the variables of other defines before stopping
+        self.d_defdepth = 200
+        # Tokens a define can be replaced with before stopping
+        self.d_defsize = 100000
 
-        # Declares dictionary
-        self.d_declares = {}
         # Declares assign
         self.d_decass = ':'
         # Declares separator
@@ -54,8 +54,6 @@ class Description:
         # Labels same line
         self.d_labsml = '@'
 
-        # Functions dictionary
-        self.d_functions = {}
         # Functions delimiter open
         self.d_funcop = '('
         # Functions delimiter close
@@ -67,8 +65,6 @@ class Description:
         # Function names
         d_funcnm = fr'^\.{d_idnocaps}$'
 
-        # Toggle rems list
-        self.d_keeps = []
         # Toggle rem keep all
         self.d_keep_all = '#ALL'
         # Toggle rem keep none
@@ -80,8 +76,6 @@ class Description:
         # Toggle rem checker
         self.d_togremchk = fr'^(#)({d_idcaps})$'
 
-        # Remtags dictionary
-        self.d_remtags = {}
         # Remtags match regex
         self.d_match_remtags = r'^\s*##BB:([a-zA-Z_0-9]+)=(.*)$'
         # Remtags commands
@@ -100,7 +94,8 @@ class Description:
         self.d_instsp_str = '_'
 
         # Hack so the regex match partially until it get to the correct match
-        d_partls = [r'\.']
+        # Only used by the legacy lexer, the automaton does not need it
+        self.d_partls = [r'\.']
 
         # Additional tokens
         # (These tokens are not used for match, they are entered directly on the code
@@ -124,7 +119,6 @@ class Description:
         dig_inst = fr"(?P<d_instrc>{self.join_commands(d_instrc)})"
         dig_oper = fr"(?P<d_operat>{self.join_commands(d_operat)})"
         dig_symb = fr"(?P<d_symbol>{self.join_commands(d_symbol)})"
-        dig_part = fr"(?P<d_partls>{self.join_commands(d_partls)})"
         dig_trem = fr'(?P<d_tglrem>{d_togrem})'
         dig_lems = fr"(?P<d_linrem>{d_linrem})"
         dig_brem = fr"(?P<d_o_erem>{d_o_rems})"
@@ -140,8 +134,7 @@ class Description:
                                  fr'{dig_lems}|'
                                  rf'{dig_insp}|'
                                  fr'{dig_trem}|'
-                                 fr'{dig_brem}|'
-                                 fr'{dig_part}')
+                                 fr'{dig_brem}')
 
     def join_commands(self, *args):
         '''Join list items with individual regex terminators'''
@@ -10,6 +10,7 @@ from collections import namedtuple
 # Custom modules
 from .helper import IO
 from .helper import Infolog
+from .helper import Stats
 from . import badig_dignified as Dignified
 
 # Classic modules imported in Settings.init()
@@ -40,6 +41,8 @@ class Settings:
         # User variables
         self.file_load = ''              # Source file
         self.file_save = ''              # Destination file
+        self.source_text = None          # Source code given in memory instead of read from file_load
+        self.save = True                 # Write the converted code and the reports to files
 
         self.line_start = 10             # Start line number
         self.line_step = 10              # Line step amount
@@ -47,6 +50,10 @@ class Settings:
         self.strip_spaces = False        # Strip all spaces
         self.capitalise_all = False      # Capitalize all instructions
         self.translate = False           # Translate Unicode characters to native similar
+        self.streaming = False           # Write the lines as they are generated, the passes before still hold the whole program
+        self.include_cache = True        # Keep the processed included files to reuse them
+        self.include_disk = False        # Also keep the processed included files on disk for the next conversions
+        self.build_cache = False         # Keep the saved files to give them back if nothing changed, on disk
 
         self.print_report = False        # Print the reports instead of saving
         self.label_report = False        # Show label names as rem on the converted code
@@ -54,6 +61,11 @@ class Settings:
         self.var_report = False          # Save a variable substitution report
         self.lexer_report = False        # Save or display the lexer output tokens
         self.parser_report = False       # Save or display the parser output tokens
+        self.legacy_lexer = False        # Use the legacy character by character lexer to compare the token streams
+        self.stats_report = False        # Save the time, tokens and memory of each phase as json
+        self.stats_memory = True         # Measure the peak memory on the stats report, slows the conversion
+        self.profile = 0                 # Profile the phases showing the [#] slowest functions of each (0 = off)
+        self.depfile = False             # Save the files the conversion depends on for make (.d) and as json
 
         self.tab_lenght = 4              # The amount of spaces in each TAB, used to report columns.
         self.verbose_level = 3           # Level of information: 0=silent 1+=erros 2+=warnings 3+=headers 4+=subheaders 5+=itens
@@ -62,9 +74,11 @@ class Settings:
         remtag = namedtuple('remtag', 'name help metavar')
         self.remtags = {'Badig': [remtag('EXPORT_FILE', 'Custom name to save the file', 'File_name'),
                                   remtag('ARGUMENTS', 'Pass command line arguments inside the code', 'arguments'),
+                                  remtag('PROFILE', 'Profile the phases showing the slowest functions of each', 'Amount'),
                                   remtag('HELP', 'Show all available remtags', 'True or false')]}
 
         # Other
+        self.stats = Stats()             # Measures of the conversion phases, replaced by Badig
         self.header1 = 'Converted with Basic Dignified'
         self.header2 = 'https://github.com/farique1/basic-dignified'
 
@@ -76,12 +90,14 @@ class Settings:
                       so 'external' should contain the file to be called. This will
                       reset the arguments and also pass the file to be converted'''
 
+        argv = sys.argv if external is None else external
+
         # Load the .ini file
         ini_response = self.get_ini()
 
         # Hackish way to load correct modules before properly processing the arguments
-        if '-id' in sys.argv:
-            self.system_id = sys.argv[sys.argv.index('-id') + 1]
+        if '-id' in argv:
+            self.system_id = argv[argv.index('-id') + 1]
 
         system_language_module = f'{self.system_id}.badig_{self.system_id}'
         system_tools_module = f'{self.system_id}.tools_{self.system_id}'
@@ -212,7 +228,7 @@ class Settings:
             # pass the file name + remtag args
             # else pass the command line arguments + remtag args
             if external:
-                arguments = external
+                arguments = list(external)
             else:
                 arguments = sys.argv[1:]
             arguments.extend(split_args)
@@ -227,6 +243,13 @@ class Settings:
             if save_file != '':
                 self.file_save = self.new_save_file(save_file)
 
+        # Profile with the amount of functions from the remtag
+        if profile := code_remtags.get('PROFILE'):
+            if not profile.isdigit():
+                infolog.log(1, f'Remtag must be a number: PROFILE = {profile}')
+            else:
+                self.profile = int(profile)
+
         # Unify verbose if value < 0
         if self.verbose_level < 0:
             self.verbose_level = abs(self.verbose_level)
@@ -264,7 +287,7 @@ class Settings:
         '''Get the remtags and their arguments from the Dignified file
         - file_load = the file to get the remtags from'''
 
-        d_code = IO.load_file(None, file_load)
+        d_code = IO.load_file(None, file_load, text=self.source_text)
 
         desc = Dignified.Description()
 
@@ -322,6 +345,10 @@ class Settings:
                     self.strip_spaces = configs_sec.getboolean('strip_spaces') if configs_sec.get('strip_spaces') != '' else self.strip_spaces
                     self.capitalise_all = configs_sec.getboolean('capitalize_all') if configs_sec.get('capitalize_all') != '' else self.capitalise_all
                     self.translate = configs_sec.getboolean('translate') if configs_sec.get('translate') != '' else self.translate
+                    self.streaming = configs_sec.getboolean('streaming') if configs_sec.get('streaming', '') != '' else self.streaming
+                    self.include_cache = configs_sec.getboolean('include_cache') if configs_sec.get('include_cache', '') != '' else self.include_cache
+                    self.include_disk = configs_sec.getboolean('include_disk') if configs_sec.get('include_disk', '') != '' else self.include_disk
+                    self.build_cache = configs_sec.getboolean('build_cache') if configs_sec.get('build_cache', '') != '' else self.build_cache
 
                     self.print_report = configs_sec.getboolean('print_report') if configs_sec.get('print_report') != '' else self.print_report
                     self.label_report = configs_sec.getboolean('label_report') if configs_sec.get('label_report') != '' else self.label_report
@@ -329,6 +356,11 @@ class Settings:
                     self.var_report = configs_sec.getboolean('var_report') if configs_sec.get('var_report') != '' else self.var_report
                     self.lexer_report = configs_sec.getboolean('lexer_report') if configs_sec.get('lexer_report') != '' else self.lexer_report
                     self.parser_report = configs_sec.getboolean('parser_report') if configs_sec.get('parser_report') != '' else self.parser_report
+                    self.legacy_lexer = configs_sec.getboolean('legacy_lexer') if configs_sec.get('legacy_lexer', '') != '' else self.legacy_lexer
+                    self.stats_report = configs_sec.getboolean('stats_report') if configs_sec.get('stats_report', '') != '' else self.stats_report
+                    self.stats_memory = configs_sec.getboolean('stats_memory') if configs_sec.get('stats_memory', '') != '' else self.stats_memory
+                    self.profile = int(configs_sec.get('profile') or self.profile)
+                    self.depfile = configs_sec.getboolean('depfile') if configs_sec.get('depfile', '') != '' else self.depfile
 
                     self.tab_lenght = int(configs_sec.get('tab_lenght') or self.tab_lenght)
                     self.verbose_level = int(configs_sec.get('verbose_level') or self.verbose_level)
@@ -355,12 +387,21 @@ class Settings:
                                  'strip_spaces': str(self.strip_spaces),
                                  'capitalize_all': str(self.capitalise_all),
                                  'translate': str(self.translate),
+                                 'streaming': str(self.streaming),
+                                 'include_cache': str(self.include_cache),
+                                 'include_disk': str(self.include_disk),
+                                 'build_cache': str(self.build_cache),
                                  'print_report': str(self.print_report),
                                  'label_report': str(self.label_report),
                                  'var_report': str(self.var_report),
                                  'line_report': str(self.line_report),
                                  'lexer_report': str(self.lexer_report),
                                  'parser_report': str(self.parser_report),
+                                 'legacy_lexer': str(self.legacy_lexer),
+                                 'stats_report': str(self.stats_report),
+                                 'stats_memory': str(self.stats_memory),
+                                 'profile': str(self.profile),
+                                 'depfile': str(self.depfile),
                                  'verbose_level': str(self.verbose_level)}
 
         with open(os.path.join(self.LOCAL_PATH, self.BADIG_INI), 'w') as configfile:
@@ -422,6 +463,22 @@ class Settings:
                             default=self.translate, action='store_true',
                             help='Translate Unicode characters to native similar (def %(default)s)')
 
+        parser.add_argument('-stm',
+                            default=self.streaming, action='store_true',
+                            help='Write the lines as they are generated, not a memory saving (def %(default)s)')
+
+        parser.add_argument('-nic',
+                            default=self.include_cache, action='store_false',
+                            help='Keep the processed included files to reuse them (def %(default)s)')
+
+        parser.add_argument('-icd',
+                            default=self.include_disk, action='store_true',
+                            help='Also keep the processed included files on disk for the next conversions (def %(default)s)')
+
+        parser.add_argument('-bc',
+                            default=self.build_cache, action='store_true',
+                            help='Keep the saved files to give them back if nothing changed, on disk (def %(default)s)')
+
         parser.add_argument('-vb', metavar='#',
                             default=self.verbose_level, type=int,
                             help='Verbosity level: 0=silent, 1=errors, 2=1+warnings, '
@@ -451,6 +508,26 @@ class Settings:
                             default=self.parser_report, action='store_true',
                             help='Save or display the parser output tokens (def %(default)s)')
 
+        parser.add_argument('-lgl',
+                            default=self.legacy_lexer, action='store_true',
+                            help='Use the legacy character by character lexer to compare the token streams (def %(default)s)')
+
+        parser.add_argument('-sts',
+                            default=self.stats_report, action='store_true',
+                            help='Save the time, tokens and memory of each phase as json (def %(default)s)')
+
+        parser.add_argument('-snm',
+                            default=self.stats_memory, action='store_false',
+                            help='Do not measure the peak memory on the stats report, times closer to a normal conversion (measuring def %(default)s)')
+
+        parser.add_argument('-prf', metavar='#',
+                            nargs='?', const=20, default=self.profile, type=int,
+                            help='Profile the phases showing the [#] slowest functions of each (20 if no #) (def %(default)s)')
+
+        parser.add_argument('-dep',
+                            default=self.depfile, action='store_true',
+                            help='Save the files the conversion depends on for make (.d) and as json (def %(default)s)')
+
         parser.add_argument('-asc',
                             action='store_true',
                             help='Tells Badig the file is classic ASCII Basic (def %(default)s)')
@@ -495,6 +572,10 @@ class Settings:
         self.capitalise_all = args.ca
         self.translate = args.tr
         self.load_format = 'utf-8' if self.translate else 'latin1'
+        self.streaming = args.stm
+        self.include_cache = args.nic
+        self.include_disk = args.icd
+        self.build_cache = args.bc
         self.verbose_level = args.vb
         self.write_ini_file = args.ini
 
@@ -505,3 +586,8 @@ class Settings:
         self.var_report = args.var
         self.lexer_report = args.lex
         self.parser_report = args.par
+        self.legacy_lexer = args.lgl
+        self.stats_report = args.sts
+        self.stats_memory = args.snm
+        self.profile = abs(args.prf)
+        self.depfile = args.dep
@@ -0,0 +1,172 @@
+# Variables -------------------------------------------------------------------
+class ShortVariables:
+    '''Give short named variables to the long named ones of a file
+    Keep the names that can't be used and the kept long named variables indexed
+    and a cursor on the next name to try, so each name is looked at only once
+       des = Scope object of the parser'''
+
+    def __init__(self, des):
+        self.des = des
+
+        # All short names, in the order they are tried (from zz down to aa)
+        chars = des.c_var_chr
+        mod = des.c_var_mod
+        self.names = [chars[i // mod] + chars[i % mod] for i in range(des.c_var_max)]
+        self.cursor = des.c_var_max
+
+        # Hard variables the indexes were built from
+        self.indexed = None
+
+        # Kept long named variables (name, file)
+        self.kept = set()
+
+        # Short names reserved by hard short variables or the start of kept long ones
+        self.reserved = set()
+
+    def index(self):
+        '''Rebuild the indexes if the hard variables changed
+        The sets only grow or are replaced, so their size and identity tell'''
+
+        short_vars = self.des.c_hard_short_vars
+        long_vars = self.des.c_hard_long_vars
+        indexed = (id(short_vars), len(short_vars), id(long_vars), len(long_vars))
+        if indexed == self.indexed:
+            return
+
+        vc = self.des.c_var_valid_chars
+        self.kept = {(var.var_name, var.pos.file) for var in long_vars}
+        self.reserved = set(short_vars)
+        self.reserved.update(var.var_name[:vc] for var in long_vars)
+        self.indexed = indexed
+
+    def is_kept(self, var_name, file):
+        '''Tell if a variable is kept as long named on a file'''
+
+        self.index()
+
+        return (var_name, file) in self.kept
+
+    def allocate(self):
+        '''Get the next free short name or None if they are over'''
+
+        self.index()
+
+        while self.cursor > 0:
+            self.cursor -= 1
+            short_var = self.names[self.cursor]
+            if short_var not in self.reserved:
+                return short_var
+
+        return None
+
+
+# Conflicts -------------------------------------------------------------------
+class VariableConflicts:
+    '''Index the hard and declared variables of a file to find the ones colliding with a name
+    Kept long named variables by their significant characters and by file,
+    declared variables by their short name, in the order they were declared
+    Variables added outside add_short() and add_long() are found by the size
+    and identity of the containers, which only grow or are replaced
+       des = Scope object of the parser'''
+
+    def __init__(self, des):
+        self.des = des
+
+        # Kept long named variables
+        self.long_vars = None
+        self.long_size = 0
+        self.long_prefixes = {}
+        self.long_names = set()
+        self.long_files = {}
+
+        # Declared variables
+        self.declares = None
+        self.declares_size = 0
+        self.declared_shorts = {}
+        self.declared_order = {}
+
+    def sync(self):
+        '''Bring the indexes up to date with the containers on the scope'''
+
+        long_vars = self.des.c_hard_long_vars
+        if long_vars is not self.long_vars or len(long_vars) != self.long_size:
+            self.long_vars = long_vars
+            self.long_prefixes = {}
+            self.long_names = set()
+            self.long_files = {}
+            for var in long_vars:
+                self.index_long(var)
+            self.long_size = len(long_vars)
+
+        declares = self.des.d_declares
+        if declares is not self.declares or len(declares) < self.declares_size:
+            self.declares = declares
+            self.declared_shorts = {}
+            self.declared_order = {}
+            self.declares_size = 0
+
+        # Dictionaries keep the order so the new declares are the last ones
+        new = len(declares) - self.declares_size
+        if new:
+            items = reversed(declares.items())
+            for var, short_var in reversed([next(items) for _ in range(new)]):
+                self.declared_shorts.setdefault(short_var, []).append(var)
+                self.declared_order[var] = len(self.declared_order)
+            self.declares_size = len(declares)
+
+    def index_long(self, var):
+        '''Add a kept long named variable to the indexes'''
+
+        vc = self.des.c_var_valid_chars
+        self.long_prefixes.setdefault(var.var_name[:vc], []).append(var)
+        self.long_names.add(var.var_name)
+        self.long_files.setdefault(var.val_w_file, var)
+
+    def add_short(self, var_name):
+        '''Keep a hard coded short named variable'''
+
+        self.des.c_hard_short_vars.add(var_name)
+
+    def add_long(self, tk):
+        '''Keep a long named variable'''
+
+        self.sync()
+        if tk not in self.long_vars:
+            self.long_vars.add(tk)
+            self.index_long(tk)
+            self.long_size = len(self.long_vars)
+
+    def long_colliding(self, var_name):
+        '''Get the kept long named variables starting with the same significant characters'''
+
+        self.sync()
+
+        return self.long_prefixes.get(var_name[:self.des.c_var_valid_chars], [])
+
+    def is_long(self, var_name):
+        '''Tell if a name is kept long on any file'''
+
+        self.sync()
+
+        return var_name in self.long_names
+
+    def long_on_file(self, val_w_file):
+        '''Get the kept long named variable with a name and file or None'''
+
+        self.sync()
+
+        return self.long_files.get(val_w_file)
+
+    def declared_as(self, short_var):
+        '''Get the declared variables using a short name, in the order they were declared'''
+
+        self.sync()
+
+        return self.declared_shorts.get(short_var, [])
+
+    def declare_order(self, var):
+        '''Get the position of a declared variable among the declares'''
+
+        self.sync()
+
+        return self.declared_order[var]
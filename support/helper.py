@@ -1,4 +1,15 @@
-import os.path
+import io
+import os
+import json
+import time
+import sys
+import pickle
+import pstats
+import cProfile
+import hashlib
+import tempfile
+import threading
+import tracemalloc
 from collections import namedtuple
 
 
@@ -13,7 +24,14 @@ class Infolog:
                          line text: the current line text
                          filename: the current filename
     bullet: Message leading marker
-    show_file: Show the file name'''
+    show_file: Show the file name
+
+    The messages of a thread can be collected instead of printed
+    by giving a list to Infolog.capture.output (see badig.convert())
+    and the ones printed can also be kept on Infolog.capture.record'''
+
+    # Messages collected by thread, shared by all loggers
+    capture = threading.local()
 
     def __init__(self):
         super(Infolog, self).__init__()
@@ -57,34 +75,60 @@ class Infolog:
             if error or show_file:
                 file = f'{os.path.basename(data.file)}: '
 
-        print(self.message.format(bullet=bullet, file=file, pos=pos, desc=desc))
+        message = self.message.format(bullet=bullet, file=file, pos=pos, desc=desc)
+        Infolog.emit([message])
 
         if error:
             raise SystemExit(0)
 
+    @staticmethod
+    def emit(messages):
+        '''Show messages collected before or pass them to the ones being collected'''
+
+        output = getattr(Infolog.capture, 'output', None)
+        if output is None:
+            [print(message) for message in messages]
+            record = getattr(Infolog.capture, 'record', None)
+            if record is not None:
+                record.extend(messages)
+        else:
+            output.extend(messages)
+
 
 infolog = Infolog()
 
+# Line of a loaded file, at module level so the tokens positioned on it can be pickled
+# The positions of the tokens read the text, file and leading spaces from it
+Line = namedtuple('Line', 'nmbr text file lead', defaults=(0,))
+
 
 class IO:
     '''Load the Dignified and save the classic code'''
 
-    def load_file(tk, file_load, encoding='latin1', tab_lenght=4):
+    def load_file(tk, file_load, encoding='latin1', tab_lenght=4, text=None):
         '''Load the source code and the includes.
            tk = Token for error reporting on include
            file_load = Name of the file
            encoding = File encoding format
-           tab_lenght = Spaces in each TAB'''
+           tab_lenght = Spaces in each TAB
+           text = Source code already in memory, file_load only names it'''
 
-        Line = namedtuple('Line', 'nmbr text file')
+        # The lines of a file share one copy of its name
+        file_load = sys.intern(file_load) if file_load else file_load
         listing = [Line(0, 'PROGRAM', file_load)]
 
-        if file_load:
+        if text is not None:
+            for i, line in enumerate(io.StringIO(text, newline=None), 1):
+                line_prep = line.expandtabs(tab_lenght)
+                listing.append(Line(i, line_prep, file_load,
+                                    len(line_prep) - len(line_prep.lstrip())))
+        elif file_load:
             try:
                 with open(file_load, 'r', encoding=encoding) as f:
                     for i, line in enumerate(f, 1):
                         line_prep = line.expandtabs(tab_lenght)
-                        listing.append(Line(i, line_prep, file_load))
+                        listing.append(Line(i, line_prep, file_load,
+                                            len(line_prep) - len(line_prep.lstrip())))
             except IOError:
                 infolog.log(1, f'File not found: {file_load}', tk)
         else:
@@ -114,3 +158,267 @@ class IO:
                                     f'    {file_save}', tk)
         except IOError:
             infolog.log(1, f'Save folder not found: {file_save}', tk)
+
+
+# Cache -----------------------------------------------------------------------
+class Cache:
+    '''Keep objects on disk while the files they are built from do not change
+       file_cache = Name of the cache file
+       sources = Files the objects are built from
+       extra = Other text the objects depend on'''
+
+    def __init__(self, file_cache, sources, extra=''):
+        self.file_cache = file_cache
+
+        digest = hashlib.sha256(extra.encode('utf-8'))
+        for source in sources:
+            with open(source, 'rb') as f:
+                digest.update(f.read())
+        self.key = digest.hexdigest()
+
+    @staticmethod
+    def digest(file_load):
+        '''Hash the content of a file or None if it can't be read'''
+
+        try:
+            with open(file_load, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def load(self):
+        '''Get the cached objects or None if missing or outdated'''
+
+        try:
+            with open(self.file_cache, 'rb') as f:
+                key, data = pickle.load(f)
+        except (OSError, EOFError, ValueError, TypeError,
+                AttributeError, ImportError, pickle.UnpicklingError):
+            return None
+
+        if key != self.key:
+            return None
+
+        return data
+
+    def save(self, data):
+        '''Store the objects
+        Failing to write only means they will be built again next time'''
+
+        folder = os.path.dirname(self.file_cache)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            handle, temp = tempfile.mkstemp(dir=folder)
+            with os.fdopen(handle, 'wb') as f:
+                pickle.dump((self.key, data), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self.file_cache)
+        except OSError:
+            pass
+
+
+# Stats -----------------------------------------------------------------------
+class Stats:
+    '''Measure and profile the phases of a conversion
+    Each phase leaves out the time, tokens, memory and calls of the phases run inside it
+       measure = Take the measures for the stats report
+       memory = Measure the peak memory with tracemalloc, makes everything slower
+       counter = Function giving the amount of tokens created so far
+       profile = Amount of slowest functions shown for each profiled phase, 0 does not profile
+    If neither measuring nor profiling all the calls do nothing'''
+
+    # Phase profiling the calls made outside all others
+    OUTSIDE = 'outside phases'
+
+    def __init__(self, measure=False, counter=None, profile=0, memory=True):
+        self.measure = measure
+        self.memory = measure and memory
+        self.profile = profile
+        self.enabled = measure or bool(profile)
+        self.counter = counter or (lambda: 0)
+        self.phases = {}
+        self.running = []
+        self.includes = 0
+        self.profiles = {}
+        self.profiling = None
+        self.tracing = False
+
+        # Memory already traced by the caller is measured but left tracing
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+
+        if self.measure:
+            self.last_time = time.perf_counter()
+            self.last_tokens = self.counter()
+
+        if self.profile:
+            self.switch(self.OUTSIDE)
+
+    def start(self, name):
+        '''Start or resume a phase inside the one running'''
+
+        if not self.enabled:
+            return
+
+        self.credit()
+        self.phase(name)
+        self.running.append(name)
+        self.switch(name)
+
+    def phase(self, name):
+        '''Get the measures of a phase, adding it to the report if new'''
+
+        if name not in self.phases:
+            self.phases[name] = {'phase': name,
+                                 'wall_time': 0.0,
+                                 'tokens_in': None,
+                                 'tokens_out': None,
+                                 'tokens_allocated': 0,
+                                 'peak_memory': 0 if self.memory else None,
+                                 'includes': 0}
+
+        return self.phases[name]
+
+    def stop(self):
+        '''Pause the running phase going back to the one it is inside'''
+
+        if not self.enabled:
+            return
+
+        self.credit()
+        self.running.pop()
+        self.switch(self.running[-1] if self.running else self.OUTSIDE)
+
+    def count(self, name, **counts):
+        '''Add amounts (tokens_in, tokens_out...) to a phase'''
+
+        if not self.enabled:
+            return
+
+        phase = self.phase(name)
+        for key, value in counts.items():
+            phase[key] = (phase.get(key) or 0) + value
+
+    def record(self, name, **values):
+        '''Set amounts known only as a whole to a phase'''
+
+        if not self.enabled:
+            return
+
+        self.phase(name).update(values)
+
+    def include(self):
+        '''Count an included file on the running phase'''
+
+        if not self.enabled:
+            return
+
+        self.includes += 1
+        if self.running:
+            self.phases[self.running[-1]]['includes'] += 1
+
+    def steps(self, name, items):
+        '''Measure a phase that runs as its items are taken
+           items = Iterator running the phase'''
+
+        if not self.enabled:
+            return iter(items)
+
+        return self.measure_steps(name, iter(items))
+
+    def measure_steps(self, name, items):
+        '''Give the items of a phase measuring the taking of each one'''
+
+        while True:
+            self.start(name)
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self.stop()
+
+            self.count(name, tokens_out=1)
+            yield item
+
+    def credit(self):
+        '''Give the measures since the last call to the running phase'''
+
+        if not self.measure:
+            return
+
+        now = time.perf_counter()
+        tokens = self.counter()
+
+        if self.running:
+            phase = self.phases[self.running[-1]]
+            phase['wall_time'] += now - self.last_time
+            phase['tokens_allocated'] += tokens - self.last_tokens
+
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                phase['peak_memory'] = max(phase['peak_memory'], peak)
+
+        # Python 3.8 can only give the peak since the start
+        if self.memory and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+        self.last_time = time.perf_counter()
+        self.last_tokens = tokens
+
+    def save(self, file_save, header):
+        '''Save the measures as json next to the converted file
+        Return the name of the saved file
+           file_save = The converted file name
+           header = Information about the conversion'''
+
+        file_save = f'{os.path.splitext(file_save)[0]}_stats.json'
+        report = {**header,
+                  'includes': self.includes,
+                  'phases': list(self.phases.values())}
+
+        IO.save_file(None, [json.dumps(report, indent=4), '\n'], file_save, 'UTF-8')
+
+        return file_save
+
+    # Profiling ---------------------------------------------------------------
+    def switch(self, name):
+        '''Send the calls from now on to the profile of a phase'''
+
+        if not self.profile:
+            return
+
+        if self.profiling:
+            self.profiling.disable()
+        self.profiling = self.profiles.setdefault(name, cProfile.Profile())
+        self.profiling.enable()
+
+    def close(self):
+        '''Stop profiling and tracing the memory if started here, the measures taken are kept'''
+
+        if self.profiling:
+            self.profiling.disable()
+            self.profiling = None
+
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+    def save_profile(self, file_save):
+        '''Save the calls of all phases as .pstats next to the converted file
+        Return the name of the saved file and a summary with the slowest functions of each phase
+           file_save = The converted file name'''
+
+        file_save = f'{os.path.splitext(file_save)[0]}_profile.pstats'
+        pstats.Stats(*self.profiles.values()).dump_stats(file_save)
+
+        summary = []
+        for name, profile in self.profiles.items():
+            text = io.StringIO()
+            calls = pstats.Stats(profile, stream=text)
+            calls.sort_stats('tottime').print_stats(self.profile)
+            summary.append(f'--- {name}\r')
+            summary.extend(line.rstrip() + '\r' for line in text.getvalue().splitlines() if line.strip())
+            summary.append('\r')
+
+        return file_save, summary